@@ -1,7 +1,18 @@
+import os
+from contextlib import nullcontext
 
 import streamlit as st
-from utils import configure_inputs, execute_analysis
+from utils import configure_inputs, execute_analysis, display_profiling
 from input_data import texto_1, texto_2
+from solve_cache import SolveCache
+from profiling import Profiler
+
+
+@st.cache_resource
+def get_solve_cache():
+    # Um único cache para todas as sessões do servidor; SOLVE_CACHE_DIR habilita a camada em disco
+    return SolveCache(disk_dir=os.environ.get("SOLVE_CACHE_DIR"))
+
 
 def main():
     st.title("Proteção diferencial de tensão em banco fuseless com ligação em estrela dividida e aterrado")
@@ -9,12 +20,34 @@ def main():
     st.image("Figura_26_ieee37p99.png", caption="Figura 26 IEEE37.99", use_container_width=True)
     st.write(texto_2)
 
-    # Configurar entradas
-    inputs = configure_inputs()
+    # Modo de profiling opcional: cada execução grava no seu próprio Profiler, isolado das outras sessões
+    profiling = st.sidebar.checkbox("Modo de profiling", help="Mede o tempo de cada etapa e grava um trace")
+    # tracemalloc é global ao processo e torna mais lentas todas as sessões do servidor: opção separada
+    trace_memory = profiling and st.sidebar.checkbox(
+        "Medir memória alocada", help="Inclui no trace os bytes alocados em cada etapa (mais lento para todas as "
+                                      "sessões do servidor enquanto a análise executa)")
+    profiler = Profiler(trace_memory=trace_memory) if profiling else None
+
+    with profiler.recording() if profiler else nullcontext():
+        # Configurar entradas
+        inputs = configure_inputs()
+        cache = get_solve_cache()
+
+        # Botão para executar a análise
+        executed = st.sidebar.button("Executar Análise")
+        if executed:
+            execute_analysis(inputs, cache)
+
+    stats = cache.stats()
+    st.sidebar.caption(f"Cache: {stats['hits'] + stats['disk_hits']} acertos, {stats['misses']} falhas, "
+                       f"{stats['entries']} resultados")
 
-    # Botão para executar a análise
-    if st.sidebar.button("Executar Análise"):
-        execute_analysis(inputs)
+    # O trace só é gravado após uma análise; nas demais interações o painel mostra a última execução
+    if profiling and executed:
+        st.session_state["profiler"] = profiler
+        display_profiling(profiler, write_trace=True)
+    elif profiling and "profiler" in st.session_state:
+        display_profiling(st.session_state["profiler"])
 
 if __name__ == "__main__":
     main()
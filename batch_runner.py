@@ -0,0 +1,194 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from compute import DEFAULT_INPUTS, run_analysis, result_to_dict
+
+
+# Estudo em lote de vários bancos: cada linha da tabela (CSV ou Parquet) define um banco com as mesmas
+# colunas de configure_inputs e uma coluna bank_id. Os resultados são gravados em JSON Lines à medida
+# que cada bloco termina, e uma nova execução com o mesmo arquivo de saída retoma de onde parou.
+
+BANK_ID_COLUMN = "bank_id"
+
+
+def read_bank_table(path):
+    import pandas as pd
+
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        table = pd.read_parquet(path)
+    else:
+        table = pd.read_csv(path)
+
+    unknown = set(table.columns) - set(DEFAULT_INPUTS) - {BANK_ID_COLUMN}
+    if unknown:
+        raise ValueError(f"Colunas desconhecidas na tabela de bancos: {', '.join(sorted(unknown))}")
+    if BANK_ID_COLUMN not in table.columns:
+        table[BANK_ID_COLUMN] = table.index.astype(str)
+
+    banks = []
+    for row in table.to_dict(orient="records"):
+        bank_id = str(row.pop(BANK_ID_COLUMN))
+        # Células vazias ficam com os valores padrão; tipos numpy viram tipos Python
+        inputs = {key: value.item() if hasattr(value, "item") else value
+                  for key, value in row.items() if not pd.isna(value)}
+        # Uma célula inválida torna a coluna inteira texto: os números das demais linhas são recuperados
+        # aqui, e o valor inválido é rejeitado por resolve_inputs somente no seu banco
+        for key, value in inputs.items():
+            if isinstance(value, str) and key != "modo_varredura":
+                try:
+                    inputs[key] = pd.to_numeric(value).item()
+                except (ValueError, TypeError):
+                    pass
+        banks.append((bank_id, inputs))
+
+    bank_ids = [bank_id for bank_id, _ in banks]
+    if len(set(bank_ids)) != len(bank_ids):
+        raise ValueError("A coluna bank_id deve ter valores únicos")
+    return banks
+
+
+def read_completed(output_path):
+    # Bancos já resolvidos com sucesso; chamar após truncate_partial_line, pois um registro completo sem
+    # a quebra de linha final seria contado aqui e removido em seguida. Linhas ilegíveis são ignoradas
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+    with open(output_path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                completed.add(record[BANK_ID_COLUMN])
+    return completed
+
+
+def truncate_partial_line(output_path):
+    # Remove a última linha incompleta deixada por uma interrupção, para que os novos registros
+    # comecem em uma linha própria
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as file:
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        if size == 0:
+            return
+        file.seek(size - 1)
+        if file.read(1) == b"\n":
+            return
+        # Procura a última quebra de linha a partir do fim, em blocos
+        position = size
+        while position > 0:
+            block_start = max(0, position - 65536)
+            file.seek(block_start)
+            block = file.read(position - block_start)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                file.truncate(block_start + newline + 1)
+                return
+            position = block_start
+        file.truncate(0)
+
+
+def solve_chunk(chunk):
+    records = []
+    for bank_id, inputs in chunk:
+        start = time.perf_counter()
+        try:
+            result = result_to_dict(run_analysis(inputs))
+        except Exception as error:
+            # Qualquer falha fica registrada no banco correspondente, sem interromper o lote
+            records.append({BANK_ID_COLUMN: bank_id, "status": "error", "error": str(error), "inputs": inputs})
+            continue
+        records.append({
+            BANK_ID_COLUMN: bank_id,
+            "status": "ok",
+            "inputs": inputs,
+            "elapsed_s": time.perf_counter() - start,
+            "result": result,
+        })
+    return records
+
+
+class ProgressReport:
+    def __init__(self, total, stream=sys.stderr):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.stream = stream
+        self.start = time.perf_counter()
+
+    def update(self, records):
+        self.done += len(records)
+        self.failed += sum(record["status"] != "ok" for record in records)
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = (self.total - self.done) / rate if rate > 0 else math.inf
+        self.stream.write(f"\r{self.done}/{self.total} bancos, {self.failed} com erro, "
+                          f"{rate:.1f} bancos/s, restam ~{remaining:.0f} s")
+        self.stream.flush()
+
+    def close(self):
+        self.stream.write("\n")
+
+
+def run_batch(banks, output_path, max_workers=None, chunk_size=4, progress=True):
+    truncate_partial_line(output_path)
+    completed = read_completed(output_path)
+    pending = [(bank_id, inputs) for bank_id, inputs in banks if bank_id not in completed]
+    chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+
+    report = ProgressReport(len(pending)) if progress else None
+    max_workers = max_workers or os.cpu_count() or 1
+    with open(output_path, "a", encoding="utf-8") as output, \
+            ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # Mantém poucos blocos em andamento para não acumular resultados na memória
+        chunks_iter = iter(chunks)
+        running = set()
+        for chunk in chunks_iter:
+            running.add(executor.submit(solve_chunk, chunk))
+            if len(running) >= 2 * max_workers:
+                break
+        while running:
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                records = future.result()
+                for record in records:
+                    output.write(json.dumps(record, allow_nan=False) + "\n")
+                output.flush()
+                if report is not None:
+                    report.update(records)
+                next_chunk = next(chunks_iter, None)
+                if next_chunk is not None:
+                    running.add(executor.submit(solve_chunk, next_chunk))
+    if report is not None:
+        report.close()
+    return len(pending)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estudo em lote de bancos fuseless em estrela dividida")
+    parser.add_argument("banks", help="Tabela de bancos em CSV ou Parquet")
+    parser.add_argument("--output", required=True, help="Arquivo JSON Lines de resultados (retomado se existir)")
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos (padrão: todos os núcleos)")
+    parser.add_argument("--chunk-size", type=int, default=4, help="Bancos por tarefa enviada a cada processo")
+    parser.add_argument("--quiet", action="store_true", help="Não exibir o progresso")
+    args = parser.parse_args(argv)
+
+    if args.chunk_size < 1:
+        raise SystemExit("--chunk-size deve ser positivo")
+    try:
+        banks = read_bank_table(args.banks)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    run_batch(banks, args.output, max_workers=args.workers, chunk_size=args.chunk_size, progress=not args.quiet)
+
+
+if __name__ == "__main__":
+    main()
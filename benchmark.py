@@ -0,0 +1,218 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from impedance_analysis import ImpedanceAnalysis, BatchImpedanceAnalysis
+from failure_sweep import ElementFailureSweep
+from nodal_solver import NodalBankSolver
+from compute import run_analysis
+
+
+# Benchmarks reprodutíveis dos caminhos críticos do solver. Cada caso mede a latência (mínimo e mediana
+# de várias repetições) e o pico de memória alocada (tracemalloc, em uma execução separada), e o
+# resultado é salvo em JSON para comparar commits:
+#   python benchmark.py --output antes.json
+#   python benchmark.py --output depois.json --compare antes.json
+
+BANK_SIZES = ((12, 1), (24, 4), (50, 10), (100, 25), (200, 50))
+QUICK_BANK_SIZES = ((12, 1), (24, 4))
+INTERNAL_SERIES = (2, 4, 8)
+SWEEP_DEPTHS = (1, 4, 12)
+BATCH_CASES = 1000
+
+FREQUENCY = 60
+V_PHASE = complex(138e3 / np.sqrt(3), 0)
+CAN_IMPEDANCE = 1 / (1j * 2 * np.pi * FREQUENCY * 8.37e-6)
+LOW_VOLTAGE_IMPEDANCE = 1 / (1j * 2 * np.pi * FREQUENCY * 200e-6)
+
+
+def bank_matrix(nr_serie, nr_paralelo):
+    return CAN_IMPEDANCE * np.ones((nr_serie, nr_paralelo), dtype=complex)
+
+
+def bench_perform_analysis(nr_serie, nr_paralelo):
+    matrix = bank_matrix(nr_serie, nr_paralelo)
+
+    def run():
+        analysis = ImpedanceAnalysis(matrix, LOW_VOLTAGE_IMPEDANCE, matrix, LOW_VOLTAGE_IMPEDANCE, V_PHASE)
+        analysis.perform_analysis()
+    return run
+
+
+def batch_cases(nr_serie, nr_paralelo):
+    # Entrada do lote limitada a ~64 MB de matrizes complexas nos maiores bancos
+    return max(1, min(BATCH_CASES, 2 ** 22 // (nr_serie * nr_paralelo)))
+
+
+def bench_batch_analysis(nr_serie, nr_paralelo, n_cases):
+    rng = np.random.default_rng(0)
+    matrices = CAN_IMPEDANCE * (1 + 0.01 * rng.standard_normal((n_cases, nr_serie, nr_paralelo)))
+
+    def run():
+        BatchImpedanceAnalysis(matrices, LOW_VOLTAGE_IMPEDANCE, matrices, LOW_VOLTAGE_IMPEDANCE,
+                               V_PHASE).perform_analysis()
+    return run
+
+
+def bench_exhaustive_sweep(nr_serie, nr_paralelo, nr_serie_internos):
+    matrix = bank_matrix(nr_serie, nr_paralelo)
+
+    def run():
+        ElementFailureSweep(matrix, LOW_VOLTAGE_IMPEDANCE, matrix, LOW_VOLTAGE_IMPEDANCE, V_PHASE,
+                            nr_serie_internos).run()
+    return run
+
+
+def bench_nodal_factorization(nr_serie, nr_paralelo, nr_serie_internos):
+    matrix = bank_matrix(nr_serie, nr_paralelo)
+
+    def run():
+        NodalBankSolver(matrix, LOW_VOLTAGE_IMPEDANCE, matrix, LOW_VOLTAGE_IMPEDANCE, V_PHASE,
+                        nr_serie_internos, 9)
+    return run
+
+
+def bench_nodal_sweep(nr_serie, nr_paralelo, nr_serie_internos, depth):
+    # Falhas acumuladas ao longo da cadeia 1, reaproveitando a fatoração
+    matrix = bank_matrix(nr_serie, nr_paralelo)
+    solver = NodalBankSolver(matrix, LOW_VOLTAGE_IMPEDANCE, matrix, LOW_VOLTAGE_IMPEDANCE, V_PHASE,
+                             nr_serie_internos, 9)
+    order = [(0, row, 0, group) for row in range(nr_serie - 1) for group in range(nr_serie_internos)][:depth]
+
+    def run():
+        for step in range(len(order) + 1):
+            solver.solve(shorts=order[:step])
+    return run
+
+
+def bench_sequential_analysis(nr_serie, nr_paralelo, nr_serie_internos):
+    inputs = {"nr_serie": nr_serie, "nr_paralelo": nr_paralelo, "nr_serie_internos": nr_serie_internos}
+
+    def run():
+        run_analysis(inputs)
+    return run
+
+
+def build_cases(quick):
+    # (nome, parâmetros, fábrica do caso): a preparação só é feita para os casos executados
+    sizes = QUICK_BANK_SIZES if quick else BANK_SIZES
+    for s, p in sizes:
+        size = {"nr_serie": s, "nr_paralelo": p}
+        yield "perform_analysis", size, lambda s=s, p=p: bench_perform_analysis(s, p)
+        n_cases = batch_cases(s, p)
+        yield ("batch_analysis", dict(size, n_cases=n_cases),
+               lambda s=s, p=p, n=n_cases: bench_batch_analysis(s, p, n))
+        for k in INTERNAL_SERIES:
+            params = dict(size, nr_serie_internos=k)
+            yield "exhaustive_sweep", params, lambda s=s, p=p, k=k: bench_exhaustive_sweep(s, p, k)
+            yield "nodal_factorization", params, lambda s=s, p=p, k=k: bench_nodal_factorization(s, p, k)
+            yield "sequential_analysis", params, lambda s=s, p=p, k=k: bench_sequential_analysis(s, p, k)
+            for depth in SWEEP_DEPTHS:
+                yield ("nodal_sweep", dict(params, depth=depth),
+                       lambda s=s, p=p, k=k, d=depth: bench_nodal_sweep(s, p, k, d))
+
+
+def measure(run, repeats, min_time):
+    run()  # aquecimento
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < repeats or time.perf_counter() - start < min_time:
+        begin = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - begin)
+        if len(timings) >= 10 * repeats:
+            break
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "repeats": len(timings),
+        "peak_memory_bytes": peak,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata():
+    import scipy
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+    }
+
+
+def case_key(record):
+    return record["benchmark"], json.dumps(record["params"], sort_keys=True)
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = {case_key(record): record for record in json.load(file)["results"]}
+
+    regressions = 0
+    for record in results:
+        previous = baseline.get(case_key(record))
+        if previous is None:
+            continue
+        ratio = record["min_s"] / previous["min_s"]
+        flag = "REGRESSÃO" if ratio > 1 + threshold else ""
+        regressions += bool(flag)
+        print(f"{record['benchmark']:<22} {json.dumps(record['params'], sort_keys=True):<70} "
+              f"{previous['min_s'] * 1e3:10.3f} ms -> {record['min_s'] * 1e3:10.3f} ms  x{ratio:5.2f} {flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do solver e das varreduras de falhas")
+    parser.add_argument("--output", default="benchmark_results.json", help="Arquivo JSON de resultados")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Aumento relativo de latência considerado regressão (padrão: 0.10)")
+    parser.add_argument("--quick", action="store_true", help="Somente os bancos pequenos")
+    parser.add_argument("--filter", help="Executa apenas benchmarks cujo nome contém este texto")
+    parser.add_argument("--repeats", type=int, default=5, help="Repetições mínimas por caso")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Tempo mínimo de medição por caso (s)")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name, params, factory in build_cases(args.quick):
+        if args.filter and args.filter not in name:
+            continue
+        record = {"benchmark": name, "params": params, **measure(factory(), args.repeats, args.min_time)}
+        results.append(record)
+        print(f"{name:<22} {json.dumps(params, sort_keys=True):<70} {record['min_s'] * 1e3:10.3f} ms "
+              f"{record['peak_memory_bytes'] / 2 ** 20:8.2f} MiB", file=sys.stderr)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({"metadata": metadata(), "results": results}, file, indent=2)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
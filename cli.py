@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import sys
+from contextlib import nullcontext
+
+from compute import DEFAULT_INPUTS, SWEEP_MODES, run_analysis, result_to_dict
+from result_export import EXPORT_FORMATS, export_result
+from profiling import PROFILER, Profiler
+
+
+# Execução sem interface: mesmos parâmetros de configure_inputs, lidos de JSON/YAML e/ou de opções.
+# Exemplo: python cli.py --config banco.yaml --nr-serie 14 --output resultado.json
+
+INPUT_HELP = {
+    "frequencia": "Frequência (Hz)",
+    "tensao_kv": "Tensão de Linha (kV)",
+    "nr_serie": "Número de Capacitores em Série",
+    "nr_paralelo": "Número de Capacitores em Paralelo",
+    "capacitancia_padrao_uf": "Capacitância Padrão (µF)",
+    "capacitancia_baixa_tensao_uf": "Capacitância Baixa Tensão (µF)",
+    "nr_serie_internos": "Número de SubCapacitores em Série",
+    "nr_paralelo_internos": "Número de SubCapacitores em Paralelo",
+    "tensao_lata": "Tensão nominal da lata (V)",
+    "modo_varredura": "Modo de Varredura",
+}
+
+
+def load_config(path):
+    with open(path, encoding="utf-8") as file:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit("Leitura de YAML requer o pacote PyYAML (pip install pyyaml)")
+            config = yaml.safe_load(file)
+        else:
+            config = json.load(file)
+    if not isinstance(config, dict):
+        raise SystemExit(f"O arquivo '{path}' deve conter um dicionário de parâmetros")
+    return config
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Proteção diferencial de tensão em banco fuseless com ligação em estrela dividida",
+    )
+    parser.add_argument("--config", help="Arquivo JSON ou YAML com os parâmetros de entrada")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: saída padrão)")
+    parser.add_argument("--export-dir", help="Diretório para exportar os históricos completos da varredura")
+    parser.add_argument("--export-format", choices=EXPORT_FORMATS, default="parquet",
+                        help="Formato colunar da exportação (padrão: parquet)")
+    parser.add_argument("--profile", help="Grava um trace de tempos (Chrome; *.speedscope.json para speedscope)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Inclui no trace os bytes alocados em cada etapa (mais lento)")
+    for key, default in DEFAULT_INPUTS.items():
+        option = "--" + key.replace("_", "-")
+        if key == "modo_varredura":
+            parser.add_argument(option, dest=key, choices=SWEEP_MODES, help=INPUT_HELP[key])
+        else:
+            parser.add_argument(option, dest=key, type=type(default),
+                                help=f"{INPUT_HELP[key]} (padrão: {default})")
+    return parser
+
+
+def solve_and_export(args):
+    # Resolve, exporta e serializa; tudo o que entra no trace quando --profile é usado
+    # Opções da linha de comando têm prioridade sobre o arquivo de configuração
+    inputs = load_config(args.config) if args.config else {}
+    inputs.update({key: getattr(args, key) for key in DEFAULT_INPUTS if getattr(args, key) is not None})
+
+    try:
+        result = run_analysis(inputs)
+    except ValueError as error:
+        raise SystemExit(f"Erro nas entradas: {error}")
+
+    if args.export_dir:
+        try:
+            export_result(result, args.export_dir, args.export_format)
+        except ImportError as error:
+            raise SystemExit(str(error))
+
+    with PROFILER.span("serialization"):
+        return json.dumps(result_to_dict(result), indent=2, allow_nan=False)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    profiler = Profiler(trace_memory=args.profile_memory) if args.profile else None
+    with profiler.recording() if profiler else nullcontext():
+        text = solve_and_export(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+    else:
+        sys.stdout.write(text + "\n")
+
+    if profiler is not None:
+        profiler.write_trace(args.profile)
+        for total in profiler.summary():
+            print(f"{total['name']:<24} {total['calls']:6d} x {total['total_s'] * 1e3:10.3f} ms",
+                  file=sys.stderr)
+        print(json.dumps(dict(profiler.counters)), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
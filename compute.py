@@ -0,0 +1,247 @@
+import numbers
+from collections import namedtuple
+
+import numpy as np
+
+from failure_sweep import ElementFailureSweep, SWEEP_AXES
+from nodal_solver import NodalBankSolver
+from profiling import PROFILER, profiled
+
+
+# API de cálculo sem interface: não importa streamlit nem pandas, para uso em scripts, CLI e lotes.
+
+DEFAULT_INPUTS = {
+    "frequencia": 60,
+    "tensao_kv": 138.0,
+    "nr_serie": 12,
+    "nr_paralelo": 1,
+    "capacitancia_padrao_uf": 8.37,
+    "capacitancia_baixa_tensao_uf": 200.0,
+    "nr_serie_internos": 4,
+    "nr_paralelo_internos": 9,
+    "tensao_lata": 7967.4,
+    "modo_varredura": "Sequencial",
+}
+
+SWEEP_MODES = ("Sequencial", "Exaustivo")
+
+BankParameters = namedtuple("BankParameters", [
+    "impedance_matrix", "impedancia_bt", "v_phase",
+    "nr_serie_internos", "nr_paralelo_internos", "tensao_lata",
+])
+
+# Varredura exaustiva: arrays com eixos SWEEP_AXES (metade, lata, cadeia, grupos em curto)
+ExhaustiveSweepResult = namedtuple("ExhaustiveSweepResult", [
+    "low_voltage_difference", "healthy_voltage_pu", "failed_can_voltage_pu",
+])
+
+
+class SequentialSweepResult:
+    # Varredura sequencial: falhas acumuladas nas três primeiras latas da cadeia 1 da metade 1 (no máximo
+    # até a penúltima). Os arrays são alocados uma única vez e preenchidos passo a passo; as grandezas por
+    # lata têm os eixos ELEMENT_AXES, forma (n_steps, nr_serie * nr_paralelo), e as demais são indexadas
+    # pelo passo.
+    # DataFrames só são montados na exibição (to_frame, summary_frame).
+    ELEMENT_AXES = ("step", "element")
+    ELEMENT_QUANTITIES = ("voltage_pu_1", "voltage_pu_2", "reactive_power_1", "reactive_power_2")
+    STEP_QUANTITIES = ("potential_transformer_ddp", "v_low_voltage_1", "i_low_voltage_1",
+                       "low_voltage_reactive_power_1", "low_voltage_reactive_power_2")
+
+    def __init__(self, n_steps, n_elements, tensao_lata, healthy_element):
+        self.tensao_lata = tensao_lata
+        # Índice, no eixo element, da lata reportada como sã
+        self.healthy_element = healthy_element
+        self.failed_elements = np.arange(n_steps)
+        for name in self.ELEMENT_QUANTITIES:
+            setattr(self, name, np.empty((n_steps, n_elements)))
+        for name in self.STEP_QUANTITIES:
+            setattr(self, name, np.empty(n_steps))
+
+    @property
+    def n_steps(self):
+        return len(self.failed_elements)
+
+    def record(self, step, solution):
+        # Escreve diretamente nas linhas pré-alocadas, sem arrays intermediários por passo
+        np.abs(solution.voltage_matrix_1.ravel(), out=self.voltage_pu_1[step])
+        np.abs(solution.voltage_matrix_2.ravel(), out=self.voltage_pu_2[step])
+        self.voltage_pu_1[step] /= self.tensao_lata
+        self.voltage_pu_2[step] /= self.tensao_lata
+        self.reactive_power_1[step] = solution.reactive_power_matrix_1.ravel()
+        self.reactive_power_2[step] = solution.reactive_power_matrix_2.ravel()
+
+        self.potential_transformer_ddp[step] = solution.low_voltage_difference
+        self.v_low_voltage_1[step] = np.abs(solution.v_low_voltage_1)
+        self.i_low_voltage_1[step] = np.abs(solution.i_low_voltage_1)
+        self.low_voltage_reactive_power_1[step] = solution.low_voltage_reactive_power_1
+        self.low_voltage_reactive_power_2[step] = solution.low_voltage_reactive_power_2
+
+    @property
+    def voltage_healthy_capacitors(self):
+        # Última lata da cadeia em falha (metade 1, cadeia 1), que nunca entra em falha nesta varredura
+        return self.voltage_pu_1[:, self.healthy_element]
+
+    @property
+    def total_reactive_power(self):
+        # Potência da fase em falta mais duas vezes a das fases sãs (estado sem falhas)
+        phase_reactive_power = (self.low_voltage_reactive_power_1 + self.low_voltage_reactive_power_2 +
+                                self.reactive_power_1.sum(axis=1) + self.reactive_power_2.sum(axis=1))
+        return phase_reactive_power + 2 * phase_reactive_power[0]
+
+    # Grandezas do capacitor de baixa tensão no estado sem falhas
+    @property
+    def v_low_voltage(self):
+        return self.v_low_voltage_1[0]
+
+    @property
+    def i_low_voltage(self):
+        return self.i_low_voltage_1[0]
+
+    @property
+    def low_voltage_reactive_power(self):
+        return self.low_voltage_reactive_power_1[0]
+
+    def as_dict(self):
+        names = ("failed_elements", "potential_transformer_ddp", "voltage_healthy_capacitors") + \
+            self.ELEMENT_QUANTITIES + \
+            ("total_reactive_power", "v_low_voltage", "i_low_voltage", "low_voltage_reactive_power")
+        return {name: getattr(self, name) for name in names}
+
+    def to_frame(self, quantity):
+        # Visão pandas de uma grandeza por lata: elementos nas linhas, passos nas colunas
+        import pandas as pd
+
+        if quantity not in self.ELEMENT_QUANTITIES:
+            raise ValueError(f"Grandeza por elemento deve ser uma de {self.ELEMENT_QUANTITIES}")
+        values = getattr(self, quantity)
+        return pd.DataFrame(values.T, index=pd.RangeIndex(values.shape[1], name=self.ELEMENT_AXES[1]),
+                            columns=pd.Index(self.failed_elements, name=self.ELEMENT_AXES[0]))
+
+    def summary_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame(
+            [self.potential_transformer_ddp, self.voltage_healthy_capacitors],
+            index=["Potential Transformer DDP", "Voltage Healty Capacitors"],
+            columns=[f"{ii}" for ii in self.failed_elements],
+        )
+
+
+def is_positive_real(value):
+    # Rejeita textos, booleanos, NaN e infinitos vindos de tabelas ou arquivos de configuração
+    return (isinstance(value, numbers.Real) and not isinstance(value, bool)
+            and bool(np.isfinite(value)) and value > 0)
+
+
+def resolve_inputs(inputs):
+    # Completa com os valores padrão e valida as entradas
+    resolved = dict(DEFAULT_INPUTS)
+    unknown = set(inputs) - set(DEFAULT_INPUTS)
+    if unknown:
+        raise ValueError(f"Entradas desconhecidas: {', '.join(sorted(unknown))}")
+    resolved.update({key: value for key, value in inputs.items() if value is not None})
+
+    for key in ("frequencia", "tensao_kv", "capacitancia_padrao_uf", "capacitancia_baixa_tensao_uf", "tensao_lata"):
+        if not is_positive_real(resolved[key]):
+            raise ValueError(f"'{key}' deve ser um número real positivo")
+    for key in ("nr_serie", "nr_paralelo", "nr_serie_internos", "nr_paralelo_internos"):
+        if not is_positive_real(resolved[key]) or int(resolved[key]) != resolved[key]:
+            raise ValueError(f"'{key}' deve ser um inteiro positivo")
+        resolved[key] = int(resolved[key])
+    if resolved["modo_varredura"] not in SWEEP_MODES:
+        raise ValueError(f"'modo_varredura' deve ser um de {SWEEP_MODES}")
+    return resolved
+
+
+@profiled("matrix_construction")
+def build_bank(inputs):
+    # Processar entradas
+    frequencia = inputs["frequencia"]
+    tensao = inputs["tensao_kv"] * 1e3  # Convertendo kV para V
+    capacitancia_padrao = inputs["capacitancia_padrao_uf"] * 1e-6  # Convertendo µF para F
+    capacitancia_baixa_tensao = inputs["capacitancia_baixa_tensao_uf"] * 1e-6  # Convertendo µF para F
+    nr_serie = inputs["nr_serie"]
+    nr_paralelo = inputs["nr_paralelo"]
+    nr_serie_internos = inputs["nr_serie_internos"]
+    nr_paralelo_internos = inputs["nr_paralelo_internos"]
+
+    # Calcular impedâncias
+    impedancia_padrao = 1 / (1j * 2 * np.pi * frequencia * capacitancia_padrao)
+    impedancia_bt = 1 / (1j * 2 * np.pi * frequencia * capacitancia_baixa_tensao)
+    v_phase = complex(tensao / np.sqrt(3), 0)
+
+    return BankParameters(
+        impedance_matrix=impedancia_padrao * np.ones((nr_serie, nr_paralelo), dtype=complex),
+        impedancia_bt=impedancia_bt,
+        v_phase=v_phase,
+        nr_serie_internos=nr_serie_internos,
+        nr_paralelo_internos=nr_paralelo_internos,
+        tensao_lata=inputs["tensao_lata"],
+    )
+
+
+@profiled("run_analysis")
+def run_analysis(inputs):
+    inputs = resolve_inputs(inputs)
+    bank = build_bank(inputs)
+    if inputs["modo_varredura"] == "Exaustivo":
+        return run_exhaustive_sweep(bank)
+    return run_sequential_sweep(bank)
+
+
+def run_sequential_sweep(bank):
+    nr_serie_internos = bank.nr_serie_internos
+    nr_serie = bank.impedance_matrix.shape[0]
+    if nr_serie < 2:
+        raise ValueError("A varredura sequencial requer ao menos 2 latas em série (uma delas permanece sã)")
+    # Falhas acumuladas nos grupos internos das três primeiras latas da cadeia 1 da metade 1; em cadeias
+    # curtas, até a penúltima, pois a última lata é a reportada como sã
+    failing_cans = min(3, nr_serie - 1)
+    failure_order = [(0, row, 0, group) for row in range(failing_cans) for group in range(nr_serie_internos)]
+
+    with PROFILER.span("factorization"):
+        solver = NodalBankSolver(bank.impedance_matrix, bank.impedancia_bt, bank.impedance_matrix,
+                                 bank.impedancia_bt, bank.v_phase, nr_serie_internos, bank.nr_paralelo_internos)
+
+    # Elementos na ordem de ravel de (nr_serie, nr_paralelo): a última lata da cadeia 1 é a linha nr_serie - 1
+    nr_paralelo = bank.impedance_matrix.shape[1]
+    results = SequentialSweepResult(len(failure_order) + 1, bank.impedance_matrix.size, bank.tensao_lata,
+                                    healthy_element=(nr_serie - 1) * nr_paralelo)
+    with PROFILER.span("sweep_loop", n_steps=results.n_steps):
+        for ii in range(results.n_steps):
+            results.record(ii, solver.solve(shorts=failure_order[:ii]))
+    return results
+
+
+@profiled("exhaustive_sweep")
+def run_exhaustive_sweep(bank):
+    sweep = ElementFailureSweep(bank.impedance_matrix, bank.impedancia_bt, bank.impedance_matrix, bank.impedancia_bt,
+                                bank.v_phase, bank.nr_serie_internos)
+    result = sweep.run()
+    return ExhaustiveSweepResult(
+        low_voltage_difference=result.low_voltage_difference,
+        healthy_voltage_pu=result.healthy_voltage / bank.tensao_lata,
+        failed_can_voltage_pu=result.failed_can_voltage / bank.tensao_lata,
+    )
+
+
+def result_to_dict(result):
+    # Representação serializável em JSON de qualquer resultado da API
+    converted = {"type": type(result).__name__}
+    if isinstance(result, ExhaustiveSweepResult):
+        converted["axes"] = list(SWEEP_AXES)
+        quantities = result._asdict()
+    else:
+        converted["axes"] = list(SequentialSweepResult.ELEMENT_AXES)
+        quantities = result.as_dict()
+    for name, value in quantities.items():
+        converted[name] = to_json_value(value)
+    return converted
+
+
+def to_json_value(value):
+    # Listas aninhadas com NaN e infinitos como None: json.dumps os escreveria como tokens inválidos em JSON
+    array = np.asarray(value)
+    if array.dtype.kind == "f":
+        array = np.where(np.isfinite(array), array, None)
+    return array.tolist()
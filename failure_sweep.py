@@ -0,0 +1,80 @@
+from collections import namedtuple
+
+import numpy as np
+
+from profiling import PROFILER
+
+
+# Eixos dos resultados: (metade, lata em série, cadeia em paralelo, grupos internos em curto)
+SWEEP_AXES = ("half", "serie", "paralelo", "n_failed")
+
+FailureSweepResult = namedtuple("FailureSweepResult", [
+    "low_voltage_difference", "v_low_voltage", "healthy_voltage", "failed_can_voltage",
+])
+
+
+class ElementFailureSweep:
+    # Varredura exaustiva de falhas de elementos internos nas duas metades da estrela dividida.
+    # Cada estado curto-circuita n_failed grupos série internos de uma única lata; como isso altera
+    # somente a soma série da cadeia afetada, a admitância equivalente da metade é atualizada em
+    # forma fechada (Y' = Y - 1/S + 1/S') em vez de resolver o banco inteiro novamente.
+    def __init__(self, impedance_matrix_1, low_voltage_impedance_1, impedance_matrix_2, low_voltage_impedance_2,
+                 v_phase, nr_serie_internos):
+        impedance_matrix_1 = np.asarray(impedance_matrix_1, dtype=complex)
+        impedance_matrix_2 = np.asarray(impedance_matrix_2, dtype=complex)
+        if impedance_matrix_1.shape != impedance_matrix_2.shape:
+            raise ValueError("As duas metades da estrela dividida devem ter a mesma forma")
+        # Com uma só lata por cadeia, o curto de todos os grupos zera a impedância da cadeia e não resta lata sã
+        # para comparar; mesmo limite da varredura sequencial
+        if impedance_matrix_1.shape[0] < 2:
+            raise ValueError("A varredura exaustiva requer ao menos 2 latas em série (as demais permanecem sãs)")
+        self.impedance_matrices = np.stack([impedance_matrix_1, impedance_matrix_2])
+        self.low_voltage_impedances = np.array([low_voltage_impedance_1, low_voltage_impedance_2], dtype=complex)
+        self.v_phase = complex(v_phase)
+        self.nr_serie_internos = int(nr_serie_internos)
+
+    @property
+    def shape(self):
+        return self.impedance_matrices.shape + (self.nr_serie_internos + 1,)
+
+    def calculate_low_voltage(self, admittance, low_voltage_impedance):
+        # Tensão no capacitor de baixa tensão: V * Zbt / (1/Y + Zbt)
+        return self.v_phase * low_voltage_impedance * admittance / (1 + low_voltage_impedance * admittance)
+
+    def calculate_healthy_impedance(self):
+        # Maior |Z| entre as demais latas da mesma cadeia (pior caso de sobretensão nas latas sãs)
+        magnitudes = np.abs(self.impedance_matrices)
+        ordered = np.sort(magnitudes, axis=1)
+        largest, second = ordered[:, -1:, :], ordered[:, -2:-1, :]
+        return np.where(magnitudes == largest, second, largest)
+
+    def run(self):
+        PROFILER.count("states_solved", int(np.prod(self.shape)))
+        nr_serie_internos = self.nr_serie_internos
+        n_failed = np.arange(nr_serie_internos + 1)
+        low_voltage_impedances = self.low_voltage_impedances[:, np.newaxis, np.newaxis, np.newaxis]
+
+        series_eq = np.sum(self.impedance_matrices, axis=1)
+        admittance = np.sum(1 / series_eq, axis=-1)
+        v_low_voltage_base = self.calculate_low_voltage(admittance, self.low_voltage_impedances)
+
+        # Lata com n grupos em curto: Z * (nr_serie_internos - n) / nr_serie_internos
+        failed_can = self.impedance_matrices[..., np.newaxis] * ((nr_serie_internos - n_failed) / nr_serie_internos)
+        series_failed = series_eq[:, np.newaxis, :, np.newaxis] + (failed_can - self.impedance_matrices[..., np.newaxis])
+        admittance_failed = (admittance[:, np.newaxis, np.newaxis, np.newaxis]
+                             - 1 / series_eq[:, np.newaxis, :, np.newaxis] + 1 / series_failed)
+
+        v_low_voltage = self.calculate_low_voltage(admittance_failed, low_voltage_impedances)
+        v_low_voltage_other = v_low_voltage_base[::-1, np.newaxis, np.newaxis, np.newaxis]
+        low_voltage_difference = np.abs(v_low_voltage - v_low_voltage_other)
+
+        branch_current = (self.v_phase - v_low_voltage) / series_failed
+        healthy_voltage = np.abs(branch_current) * self.calculate_healthy_impedance()[..., np.newaxis]
+        failed_can_voltage = np.abs(branch_current * failed_can)
+
+        return FailureSweepResult(
+            low_voltage_difference=low_voltage_difference,
+            v_low_voltage=v_low_voltage,
+            healthy_voltage=healthy_voltage,
+            failed_can_voltage=failed_can_voltage,
+        )
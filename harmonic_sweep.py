@@ -0,0 +1,159 @@
+import argparse
+import json
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from impedance_analysis import BatchImpedanceNetwork
+from compute import resolve_inputs
+from protection_settings import shorted_groups
+
+
+# Varredura harmônica: a descrição capacitiva do banco é montada uma única vez e as impedâncias de todas
+# as frequências saem de um único produto com 1 / (j * omega), resolvidas no motor em lote com um caso
+# por harmônica. As tensões harmônicas podem ser complexas (com ângulo) e são relativas à fundamental.
+
+# Eixos das grandezas por lata: (metade, harmônica, lata em série, cadeia em paralelo)
+HARMONIC_AXES = ("half", "harmonic", "serie", "paralelo")
+
+DEFAULT_HARMONIC_ORDERS = (1, 5, 7, 11, 13)
+DEFAULT_HARMONIC_VOLTAGES = (1.0, 0.04, 0.03, 0.015, 0.01)
+
+HarmonicSweepResult = namedtuple("HarmonicSweepResult", [
+    "frequencies", "low_voltage_difference", "can_voltage", "can_current", "reactive_power",
+    "rms_low_voltage_difference", "rms_can_voltage", "peak_can_voltage", "rms_can_current",
+    "total_reactive_power",
+])
+
+
+class HarmonicSweep:
+    def __init__(self, capacitance_matrix_1, capacitance_low_voltage_1, capacitance_matrix_2,
+                 capacitance_low_voltage_2, fundamental_frequency, v_phase):
+        # Capacitâncias em F; capacitance_matrix_1/2 com forma (nr_serie, nr_paralelo), como em
+        # ImpedanceNetwork.calculate_capacitance_matrix
+        capacitance_matrices = np.stack([np.asarray(capacitance_matrix_1, dtype=float),
+                                         np.asarray(capacitance_matrix_2, dtype=float)])
+        # Parte independente da frequência: Z(omega) = elastance / (j * omega)
+        self.elastance_matrices = 1 / capacitance_matrices
+        self.low_voltage_elastances = 1 / np.array([capacitance_low_voltage_1, capacitance_low_voltage_2])
+        self.fundamental_frequency = fundamental_frequency
+        self.v_phase = v_phase
+
+    @classmethod
+    def from_inputs(cls, inputs, failed_groups=0, location=(0, 0)):
+        # failed_groups: grupos internos em curto acumulados lata a lata na cadeia location = (metade, paralelo),
+        # na mesma ordem de ProtectionSettingSolver; sem falhas as metades são iguais e o TP não vê tensão
+        inputs = resolve_inputs(inputs)
+        nr_serie, nr_paralelo = inputs["nr_serie"], inputs["nr_paralelo"]
+        nr_serie_internos = inputs["nr_serie_internos"]
+        half, paralelo = location
+        if half not in (0, 1) or not 0 <= paralelo < nr_paralelo:
+            raise ValueError(f"Local de falha fora do banco: metade em (0, 1) e cadeia em [0, {nr_paralelo})")
+        max_failures = nr_serie_internos * (nr_serie - 1)
+        if not 0 <= failed_groups <= max_failures:
+            raise ValueError(f"failed_groups deve estar em [0, {max_failures}] (a última lata da cadeia permanece sã)")
+
+        # Lata com k grupos em curto: capacitância C * nsi / (nsi - k); lata inteira em curto, elastância nula
+        remaining = nr_serie_internos - shorted_groups((2, nr_serie, nr_paralelo), nr_serie_internos, location,
+                                                       failed_groups)
+        with np.errstate(divide="ignore"):
+            capacitance_matrices = inputs["capacitancia_padrao_uf"] * 1e-6 * nr_serie_internos / remaining
+        capacitance_low_voltage = inputs["capacitancia_baixa_tensao_uf"] * 1e-6
+        return cls(capacitance_matrices[0], capacitance_low_voltage, capacitance_matrices[1], capacitance_low_voltage,
+                   inputs["frequencia"], complex(inputs["tensao_kv"] * 1e3 / np.sqrt(3), 0))
+
+    @classmethod
+    def from_analysis(cls, analysis, frequency):
+        # Reaproveita os bancos de um ImpedanceAnalysis montado na frequência fundamental
+        def low_voltage_capacitance(impedance):
+            return -1 / (np.imag(impedance) * 2 * np.pi * frequency)
+
+        return cls(analysis.network_1.calculate_capacitance_matrix(frequency),
+                   low_voltage_capacitance(analysis.low_voltage_impedance_1),
+                   analysis.network_2.calculate_capacitance_matrix(frequency),
+                   low_voltage_capacitance(analysis.low_voltage_impedance_2),
+                   frequency, analysis.v_phase)
+
+    def run(self, harmonic_orders=DEFAULT_HARMONIC_ORDERS, harmonic_voltages=DEFAULT_HARMONIC_VOLTAGES):
+        harmonic_orders = np.asarray(harmonic_orders, dtype=float)
+        voltages = self.v_phase * np.broadcast_to(np.asarray(harmonic_voltages, dtype=complex),
+                                                  harmonic_orders.shape)
+        frequencies = self.fundamental_frequency * harmonic_orders
+        inverse_omega = 1 / (1j * 2 * np.pi * frequencies)
+
+        solutions = [
+            BatchImpedanceNetwork(inverse_omega[:, np.newaxis, np.newaxis] * elastance_matrix,
+                                  inverse_omega * low_voltage_elastance, voltages).solve()
+            for elastance_matrix, low_voltage_elastance in zip(self.elastance_matrices,
+                                                               self.low_voltage_elastances)
+        ]
+        low_voltage_difference = np.abs(solutions[1].v_low_voltage - solutions[0].v_low_voltage)
+        can_voltage = np.abs(np.stack([solution.voltage_matrix for solution in solutions]))
+        can_current = np.abs(np.stack([solution.current_matrix for solution in solutions]))
+        reactive_power = np.stack([solution.reactive_power_matrix for solution in solutions])
+
+        # Combinação das harmônicas: RMS (raiz da soma dos quadrados) e pico pela soma aritmética das
+        # amplitudes (pior caso de fase, expresso em valor eficaz equivalente)
+        return HarmonicSweepResult(
+            frequencies=frequencies,
+            low_voltage_difference=low_voltage_difference,
+            can_voltage=can_voltage,
+            can_current=can_current,
+            reactive_power=reactive_power,
+            rms_low_voltage_difference=float(np.sqrt(np.sum(low_voltage_difference ** 2))),
+            rms_can_voltage=np.sqrt(np.sum(can_voltage ** 2, axis=1)),
+            peak_can_voltage=np.sum(can_voltage, axis=1),
+            rms_can_current=np.sqrt(np.sum(can_current ** 2, axis=1)),
+            total_reactive_power=np.sum(reactive_power, axis=1),
+        )
+
+
+def main(argv=None):
+    from cli import load_config
+
+    parser = argparse.ArgumentParser(description="Varredura harmônica das tensões do banco e do TP")
+    parser.add_argument("--config", help="Arquivo JSON ou YAML com os parâmetros do banco")
+    parser.add_argument("--orders", type=float, nargs="+",
+                        default=[float(order) for order in DEFAULT_HARMONIC_ORDERS],
+                        help="Ordens harmônicas (padrão: 1 5 7 11 13)")
+    parser.add_argument("--magnitudes", type=float, nargs="+", default=None,
+                        help="Tensão de cada harmônica em pu da fundamental")
+    parser.add_argument("--failed-groups", type=int, default=0,
+                        help="Grupos internos em curto, acumulados lata a lata na cadeia de --location")
+    parser.add_argument("--location", type=int, nargs=2, default=[0, 0], metavar=("HALF", "PARALELO"),
+                        help="Cadeia em falha: metade (0 ou 1) e cadeia em paralelo (padrão: 0 0)")
+    args = parser.parse_args(argv)
+
+    inputs = resolve_inputs(load_config(args.config) if args.config else {})
+    magnitudes = args.magnitudes
+    if magnitudes is None:
+        if args.orders != list(DEFAULT_HARMONIC_ORDERS):
+            raise SystemExit("Informe --magnitudes para ordens harmônicas diferentes do padrão")
+        magnitudes = list(DEFAULT_HARMONIC_VOLTAGES)
+    if len(magnitudes) != len(args.orders):
+        raise SystemExit("--orders e --magnitudes devem ter o mesmo número de valores")
+
+    try:
+        sweep = HarmonicSweep.from_inputs(inputs, failed_groups=args.failed_groups, location=tuple(args.location))
+    except ValueError as error:
+        raise SystemExit(f"Erro nas entradas: {error}")
+    result = sweep.run(args.orders, magnitudes)
+    tensao_lata = inputs["tensao_lata"]
+    report = {
+        "failed_groups": args.failed_groups,
+        "location": args.location,
+        "harmonic_orders": args.orders,
+        "frequencies": result.frequencies.tolist(),
+        "low_voltage_difference": result.low_voltage_difference.tolist(),
+        "max_can_voltage_pu": (result.can_voltage.max(axis=(0, 2, 3)) / tensao_lata).tolist(),
+        "rms_low_voltage_difference": result.rms_low_voltage_difference,
+        "max_rms_can_voltage_pu": float(result.rms_can_voltage.max() / tensao_lata),
+        "max_peak_can_voltage_pu": float(result.peak_can_voltage.max() / tensao_lata),
+        "max_rms_can_current": float(result.rms_can_current.max()),
+    }
+    sys.stdout.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,75 @@
+from collections import namedtuple
+
 import numpy as np
-import pandas as pd
+
+from profiling import PROFILER, profiled
+
+
+# Grandezas de uma solução da rede; nos motores em lote todas ganham um eixo inicial de casos
+NetworkSolution = namedtuple("NetworkSolution", [
+    "voltage_matrix", "v_low_voltage",
+    "current_matrix", "i_low_voltage",
+    "reactive_power_matrix", "low_voltage_reactive_power",
+])
+
+
+# Atributos de resultado preenchidos por perform_analysis
+RESULT_ATTRIBUTES = (
+    "voltage_matrix_1", "voltage_matrix_2",
+    "reactive_power_matrix_1", "reactive_power_matrix_2",
+    "current_matrix_1", "current_matrix_2",
+    "v_low_voltage_1", "v_low_voltage_2",
+    "i_low_voltage_1", "i_low_voltage_2",
+    "low_voltage_difference",
+    "low_voltage_reactive_power_1", "low_voltage_reactive_power_2",
+)
 
 
 class ImpedanceNetwork:
     def __init__(self, impedance_matrix, low_voltage_impedance, v_phase):
+        self._solution = None
         self.impedance_matrix = impedance_matrix
         self.low_voltage_impedance = low_voltage_impedance
         self.v_phase = v_phase
-        self.total_impedance = None
+
+    # As entradas são propriedades: qualquer atribuição invalida a solução guardada. A matriz é copiada
+    # como somente leitura, de modo que alterações no array original não deixam o resultado desatualizado.
+    @property
+    def impedance_matrix(self):
+        return self._impedance_matrix
+
+    @impedance_matrix.setter
+    def impedance_matrix(self, value):
+        matrix = np.array(value, dtype=complex)
+        matrix.flags.writeable = False
+        self._impedance_matrix = matrix
+        self.invalidate()
+
+    @property
+    def low_voltage_impedance(self):
+        return self._low_voltage_impedance
+
+    @low_voltage_impedance.setter
+    def low_voltage_impedance(self, value):
+        self._low_voltage_impedance = value
+        self.invalidate()
+
+    @property
+    def v_phase(self):
+        return self._v_phase
+
+    @v_phase.setter
+    def v_phase(self, value):
+        self._v_phase = value
+        self.invalidate()
+
+    @property
+    def total_impedance(self):
+        return self.calculate_total_impedance()
+
+    def invalidate(self):
+        self._solution = None
+        self._total_impedance = None
 
     def calculate_series_equivalent_impedance(self):
         return np.sum(self.impedance_matrix, axis=0)
@@ -16,56 +78,45 @@ class ImpedanceNetwork:
         return 1 / np.sum(1 / series_impedances)
 
     def calculate_total_impedance(self):
-        series_eq_impedances = self.calculate_series_equivalent_impedance()
-        parallel_eq_impedance = self.calculate_parallel_equivalent_impedance(series_eq_impedances)
-        self.total_impedance = parallel_eq_impedance + self.low_voltage_impedance
-        return self.total_impedance
+        if self._total_impedance is None:
+            series_eq_impedances = self.calculate_series_equivalent_impedance()
+            parallel_eq_impedance = self.calculate_parallel_equivalent_impedance(series_eq_impedances)
+            self._total_impedance = parallel_eq_impedance + self.low_voltage_impedance
+        return self._total_impedance
+
+    def solve(self):
+        # Somas série, correntes e todas as grandezas calculadas em uma única passagem (motor em lote com
+        # um caso); o resultado fica guardado até a próxima alteração das entradas
+        if self._solution is not None:
+            PROFILER.count("network_cache_hits")
+        else:
+            batch = BatchImpedanceNetwork(self.impedance_matrix[np.newaxis], self.low_voltage_impedance,
+                                          self.v_phase)
+            quantities = []
+            for value in batch.solve():
+                value = value[0].copy()
+                if isinstance(value, np.ndarray):
+                    value.flags.writeable = False
+                quantities.append(value)
+            self._solution = NetworkSolution(*quantities)
+        return self._solution
 
     def calculate_total_current(self):
-        if self.total_impedance is None:
-            self.calculate_total_impedance()
-        return self.v_phase / self.total_impedance
+        return self.solve().i_low_voltage
 
     def calculate_voltage_matrix(self):
-        total_current = self.calculate_total_current()
-        series_eq_impedances = self.calculate_series_equivalent_impedance()
-
-        voltage_matrix = np.zeros(self.impedance_matrix.shape, dtype=complex)
-        for col in range(self.impedance_matrix.shape[1]):
-            branch_current = total_current * (series_eq_impedances[col] / np.sum(series_eq_impedances))
-            voltage_matrix[:, col] = branch_current * self.impedance_matrix[:, col]
-
-        v_low_voltage_impedance = total_current * self.low_voltage_impedance
-        return voltage_matrix, v_low_voltage_impedance
+        solution = self.solve()
+        return solution.voltage_matrix, solution.v_low_voltage
 
     def calculate_reactive_power_matrix(self):
-        total_current = self.calculate_total_current()
-        series_eq_impedances = self.calculate_series_equivalent_impedance()
-
-        reactive_power_matrix = np.zeros(self.impedance_matrix.shape)
-        for col in range(self.impedance_matrix.shape[1]):
-            branch_current = total_current * (series_eq_impedances[col] / np.sum(series_eq_impedances))
-            for row in range(self.impedance_matrix.shape[0]):
-                impedance = self.impedance_matrix[row, col]
-                reactive_power_matrix[row, col] = (np.abs(branch_current) ** 2) * impedance.imag
-
-        return reactive_power_matrix
+        return self.solve().reactive_power_matrix
 
     def calculate_low_voltage_reactive_power(self):
-        total_current = self.calculate_total_current()
-        return (np.abs(total_current) ** 2) * self.low_voltage_impedance.imag
+        return self.solve().low_voltage_reactive_power
 
     def calculate_current_matrix(self):
-        total_current = self.calculate_total_current()
-        series_eq_impedances = self.calculate_series_equivalent_impedance()
-
-        current_matrix = np.zeros(self.impedance_matrix.shape, dtype=complex)
-        for col in range(self.impedance_matrix.shape[1]):
-            branch_current = total_current * (series_eq_impedances[col] / np.sum(series_eq_impedances))
-            current_matrix[:, col] = branch_current
-
-        i_low_voltage_impedance = total_current
-        return current_matrix, i_low_voltage_impedance
+        solution = self.solve()
+        return solution.current_matrix, solution.i_low_voltage
 
     def calculate_capacitance_matrix(self, frequency):
         # Calcula a pulsação angular
@@ -75,6 +126,62 @@ class ImpedanceNetwork:
         return capacitance_matrix
 
 
+class BatchImpedanceNetwork:
+    # Resolve N estados do banco de uma vez: impedance_matrices tem forma (n_cases, nr_serie, nr_paralelo)
+    def __init__(self, impedance_matrices, low_voltage_impedance, v_phase):
+        self.impedance_matrices = np.asarray(impedance_matrices, dtype=complex)
+        if self.impedance_matrices.ndim != 3:
+            raise ValueError("impedance_matrices deve ter forma (n_cases, nr_serie, nr_paralelo)")
+        n_cases = self.impedance_matrices.shape[0]
+        # Impedância de baixa tensão e tensão de fase podem ser escalares ou uma por caso
+        self.low_voltage_impedance = np.broadcast_to(np.asarray(low_voltage_impedance, dtype=complex), (n_cases,))
+        self.v_phase = np.broadcast_to(np.asarray(v_phase, dtype=complex), (n_cases,))
+
+    @property
+    def n_cases(self):
+        return self.impedance_matrices.shape[0]
+
+    def calculate_series_equivalent_impedance(self):
+        return np.sum(self.impedance_matrices, axis=1)
+
+    def calculate_parallel_equivalent_impedance(self, series_impedances):
+        return 1 / np.sum(1 / series_impedances, axis=-1)
+
+    def calculate_total_impedance(self):
+        series_eq_impedances = self.calculate_series_equivalent_impedance()
+        return self.calculate_parallel_equivalent_impedance(series_eq_impedances) + self.low_voltage_impedance
+
+    def calculate_branch_currents(self):
+        # Somas série e correntes calculadas uma única vez para todos os casos
+        series_eq_impedances = self.calculate_series_equivalent_impedance()
+        parallel_eq_impedance = self.calculate_parallel_equivalent_impedance(series_eq_impedances)
+        total_current = self.v_phase / (parallel_eq_impedance + self.low_voltage_impedance)
+        branch_current = total_current[:, np.newaxis] * (parallel_eq_impedance[:, np.newaxis] / series_eq_impedances)
+        return total_current, branch_current
+
+    def solve(self):
+        PROFILER.count("states_solved", self.n_cases)
+        total_current, branch_current = self.calculate_branch_currents()
+        branch_current_rows = branch_current[:, np.newaxis, :]
+
+        voltage_matrix = branch_current_rows * self.impedance_matrices
+        current_matrix = np.repeat(branch_current_rows, self.impedance_matrices.shape[1], axis=1)
+        reactive_power_matrix = (np.abs(branch_current_rows) ** 2) * self.impedance_matrices.imag
+
+        return NetworkSolution(
+            voltage_matrix=voltage_matrix,
+            v_low_voltage=total_current * self.low_voltage_impedance,
+            current_matrix=current_matrix,
+            i_low_voltage=total_current,
+            reactive_power_matrix=reactive_power_matrix,
+            low_voltage_reactive_power=(np.abs(total_current) ** 2) * self.low_voltage_impedance.imag,
+        )
+
+    def calculate_capacitance_matrix(self, frequency):
+        omega = 2 * np.pi * frequency
+        return -1 / (np.imag(self.impedance_matrices) * omega)
+
+
 class ImpedanceAnalysis:
     def __init__(self, impedance_matrix_1, low_voltage_impedance_1, impedance_matrix_2, low_voltage_impedance_2,
                  v_phase):
@@ -100,29 +207,48 @@ class ImpedanceAnalysis:
         self.low_voltage_reactive_power_1 = None
         self.low_voltage_reactive_power_2 = None
 
+    @profiled("perform_analysis")
     def perform_analysis(self):
-        self.voltage_matrix_1, self.v_low_voltage_1 = self.network_1.calculate_voltage_matrix()
-        self.voltage_matrix_2, self.v_low_voltage_2 = self.network_2.calculate_voltage_matrix()
+        # Cada metade é resolvida uma única vez
+        solution_1 = self.network_1.solve()
+        solution_2 = self.network_2.solve()
+
+        self.voltage_matrix_1, self.v_low_voltage_1 = solution_1.voltage_matrix, solution_1.v_low_voltage
+        self.voltage_matrix_2, self.v_low_voltage_2 = solution_2.voltage_matrix, solution_2.v_low_voltage
         self.low_voltage_difference = np.abs(self.v_low_voltage_2 - self.v_low_voltage_1)
 
-        self.reactive_power_matrix_1 = self.network_1.calculate_reactive_power_matrix()
-        self.reactive_power_matrix_2 = self.network_2.calculate_reactive_power_matrix()
+        self.reactive_power_matrix_1 = solution_1.reactive_power_matrix
+        self.reactive_power_matrix_2 = solution_2.reactive_power_matrix
 
-        self.low_voltage_reactive_power_1 = self.network_1.calculate_low_voltage_reactive_power()
-        self.low_voltage_reactive_power_2 = self.network_2.calculate_low_voltage_reactive_power()
+        self.low_voltage_reactive_power_1 = solution_1.low_voltage_reactive_power
+        self.low_voltage_reactive_power_2 = solution_2.low_voltage_reactive_power
 
-        self.current_matrix_1, self.i_low_voltage_1 = self.network_1.calculate_current_matrix()
-        self.current_matrix_2, self.i_low_voltage_2 = self.network_2.calculate_current_matrix()
+        self.current_matrix_1, self.i_low_voltage_1 = solution_1.current_matrix, solution_1.i_low_voltage
+        self.current_matrix_2, self.i_low_voltage_2 = solution_2.current_matrix, solution_2.i_low_voltage
 
     def create_matrix_with_extra_row(self, matrix, extra_value):
         extra_row = [extra_value] + [0] * (matrix.shape[1] - 1)
         return np.vstack([matrix, extra_row])
 
     def create_dataframe(self, matrix, name="Branch"):
+        # pandas só é importado para exportação, mantendo leve a importação do solver
+        import pandas as pd
+
         columns = [f"{name} {i + 1}" for i in range(matrix.shape[1])]
         return pd.DataFrame(matrix, columns=columns)
 
+    def export(self, directory, frequency, file_format="parquet"):
+        # Exportação colunar incremental (Parquet, Arrow IPC ou .npy); o Excel fica como resumo opcional
+        from result_export import ResultExporter, export_analysis
+
+        with ResultExporter(directory, file_format) as exporter:
+            export_analysis(self, exporter, frequency)
+        return exporter
+
+    @profiled("export_to_excel")
     def export_to_excel(self, filename, frequency):
+        import pandas as pd
+
         voltage_magnitude_matrix_1 = self.create_matrix_with_extra_row(np.abs(self.voltage_matrix_1),
                                                                        np.abs(self.v_low_voltage_1))
         voltage_magnitude_matrix_2 = self.create_matrix_with_extra_row(np.abs(self.voltage_matrix_2),
@@ -173,3 +299,191 @@ class ImpedanceAnalysis:
                 writer, sheet_name='Network 2 Capacitance', index=False)
 
         print(f"Arquivo Excel '{filename}' criado com sucesso.")
+
+
+class BatchImpedanceAnalysis:
+    # Versão em lote de ImpedanceAnalysis: os atributos de resultado têm o eixo de casos como primeira dimensão
+    def __init__(self, impedance_matrices_1, low_voltage_impedance_1, impedance_matrices_2, low_voltage_impedance_2,
+                 v_phase):
+        self.network_1 = BatchImpedanceNetwork(impedance_matrices_1, low_voltage_impedance_1, v_phase)
+        self.network_2 = BatchImpedanceNetwork(impedance_matrices_2, low_voltage_impedance_2, v_phase)
+        if self.network_1.n_cases != self.network_2.n_cases:
+            raise ValueError("As duas metades da estrela dividida devem ter o mesmo número de casos")
+        self.v_phase = v_phase
+        self.low_voltage_impedance_1 = self.network_1.low_voltage_impedance
+        self.low_voltage_impedance_2 = self.network_2.low_voltage_impedance
+        self.initialize_analysis_variables()
+
+    def initialize_analysis_variables(self):
+        self.voltage_matrix_1 = None
+        self.voltage_matrix_2 = None
+        self.reactive_power_matrix_1 = None
+        self.reactive_power_matrix_2 = None
+        self.current_matrix_1 = None
+        self.current_matrix_2 = None
+        self.v_low_voltage_1 = None
+        self.v_low_voltage_2 = None
+        self.i_low_voltage_1 = None
+        self.i_low_voltage_2 = None
+        self.low_voltage_difference = None
+        self.low_voltage_reactive_power_1 = None
+        self.low_voltage_reactive_power_2 = None
+
+    @profiled("batch_perform_analysis")
+    def perform_analysis(self):
+        solution_1 = self.network_1.solve()
+        solution_2 = self.network_2.solve()
+
+        self.voltage_matrix_1, self.v_low_voltage_1 = solution_1.voltage_matrix, solution_1.v_low_voltage
+        self.voltage_matrix_2, self.v_low_voltage_2 = solution_2.voltage_matrix, solution_2.v_low_voltage
+        self.low_voltage_difference = np.abs(self.v_low_voltage_2 - self.v_low_voltage_1)
+
+        self.reactive_power_matrix_1 = solution_1.reactive_power_matrix
+        self.reactive_power_matrix_2 = solution_2.reactive_power_matrix
+
+        self.low_voltage_reactive_power_1 = solution_1.low_voltage_reactive_power
+        self.low_voltage_reactive_power_2 = solution_2.low_voltage_reactive_power
+
+        self.current_matrix_1, self.i_low_voltage_1 = solution_1.current_matrix, solution_1.i_low_voltage
+        self.current_matrix_2, self.i_low_voltage_2 = solution_2.current_matrix, solution_2.i_low_voltage
+
+    def case(self, index):
+        # Extrai um único caso como ImpedanceAnalysis já resolvido, útil para exportar ou exibir
+        analysis = ImpedanceAnalysis(
+            self.network_1.impedance_matrices[index], self.low_voltage_impedance_1[index],
+            self.network_2.impedance_matrices[index], self.low_voltage_impedance_2[index],
+            self.network_1.v_phase[index],
+        )
+        for name in RESULT_ATTRIBUTES:
+            value = getattr(self, name)
+            if value is not None:
+                setattr(analysis, name, value[index])
+        return analysis
+
+
+# Eixos dos resultados trifásicos: (estado, fase, lata em série, cadeia em paralelo)
+THREE_PHASE_AXES = ("state", "phase", "serie", "paralelo")
+
+# Operador de Fortescue: a = 1∠120°
+FORTESCUE_A = np.exp(2j * np.pi / 3)
+
+
+def phase_voltages(v_phase, negative_sequence=0, zero_sequence=0):
+    # Tensões fase-neutro (A, B, C) a partir da sequência positiva v_phase e dos desequilíbrios de sequência
+    # negativa e zero (relações complexas com v_phase); forma (..., 3)
+    v_positive = np.asarray(v_phase, dtype=complex)
+    v_negative = v_positive * negative_sequence
+    v_zero = v_positive * zero_sequence
+    rotation = FORTESCUE_A ** np.arange(3)
+    return (v_zero[..., np.newaxis] + v_positive[..., np.newaxis] * rotation.conj()
+            + v_negative[..., np.newaxis] * rotation)
+
+
+class ThreePhaseImpedanceAnalysis:
+    # Estrela dividida trifásica (Figura 26): em cada fase as duas metades descem do terminal da fase até os
+    # seus capacitores de baixa tensão, e todos os capacitores de baixa tensão vão ao neutro comum, ligado à
+    # terra por neutral_impedance (0 = solidamente aterrado, np.inf = isolado).
+    # impedance_matrices_1/2: forma (n_states, 3, nr_serie, nr_paralelo); (3, s, p) é um único estado e (s, p)
+    #   repete a mesma matriz nas três fases
+    # low_voltage_impedance_1/2 e voltages: escalar, uma por fase (3,) ou uma por estado e fase (n_states, 3)
+    # Os atributos de resultado têm os nomes de ImpedanceAnalysis com eixos THREE_PHASE_AXES, com tensões em
+    # relação à terra; estados e fases formam um único lote resolvido de uma vez.
+    def __init__(self, impedance_matrices_1, low_voltage_impedance_1, impedance_matrices_2, low_voltage_impedance_2,
+                 voltages, neutral_impedance=0):
+        matrices_1 = self.as_state_phase_matrices(impedance_matrices_1)
+        matrices_2 = self.as_state_phase_matrices(impedance_matrices_2)
+        if matrices_1.shape[2:] != matrices_2.shape[2:]:
+            raise ValueError("As duas metades da estrela dividida devem ter a mesma forma")
+        n_states = np.broadcast_shapes(matrices_1.shape[:1], matrices_2.shape[:1])[0]
+        self.shape = (n_states, 3)
+        self.voltages = np.broadcast_to(np.asarray(voltages, dtype=complex), self.shape)
+        self.neutral_impedance = neutral_impedance
+
+        # Cada par (estado, fase) é um caso do motor em lote
+        self.impedance_matrices = [
+            np.broadcast_to(matrices, self.shape + matrices.shape[2:]).reshape((-1,) + matrices.shape[2:])
+            for matrices in (matrices_1, matrices_2)
+        ]
+        self.low_voltage_impedances = [
+            np.broadcast_to(np.asarray(low_voltage_impedance, dtype=complex), self.shape).ravel()
+            for low_voltage_impedance in (low_voltage_impedance_1, low_voltage_impedance_2)
+        ]
+        # Redes com as tensões fase-terra; as tensões fase-neutro de perform_analysis usam redes próprias
+        self.networks = self.build_networks(self.voltages)
+        self.initialize_analysis_variables()
+
+    def build_networks(self, voltages):
+        # Redes em lote das duas metades sob as tensões de ramo dadas, forma (n_states, 3)
+        return [
+            BatchImpedanceNetwork(matrices, low_voltage_impedance, np.broadcast_to(voltages, self.shape).ravel())
+            for matrices, low_voltage_impedance in zip(self.impedance_matrices, self.low_voltage_impedances)
+        ]
+
+    @staticmethod
+    def as_state_phase_matrices(matrices):
+        matrices = np.asarray(matrices, dtype=complex)
+        if matrices.ndim == 2:
+            matrices = matrices[np.newaxis]
+        if matrices.ndim == 3:
+            matrices = matrices[np.newaxis]
+        if matrices.ndim != 4 or matrices.shape[1] not in (1, 3):
+            raise ValueError("impedance_matrices deve ter forma (n_states, 3, nr_serie, nr_paralelo)")
+        return np.broadcast_to(matrices, (matrices.shape[0], 3) + matrices.shape[2:])
+
+    def initialize_analysis_variables(self):
+        for name in RESULT_ATTRIBUTES:
+            setattr(self, name, None)
+        self.neutral_voltage = None
+        self.neutral_current = None
+
+    def calculate_neutral_voltage(self):
+        # Única equação nodal do neutro por estado: sum(Y_ramo * (V_fase - V_n)) = V_n / Z_n
+        if self.neutral_impedance == 0:
+            return np.zeros(self.shape[0], dtype=complex)
+        neutral_admittance = 0 if np.isinf(self.neutral_impedance) else 1 / self.neutral_impedance
+        branch_admittance = sum(1 / network.calculate_total_impedance() for network in self.networks)
+        branch_admittance = branch_admittance.reshape(self.shape)
+        return (np.sum(branch_admittance * self.voltages, axis=1)
+                / (neutral_admittance + np.sum(branch_admittance, axis=1)))
+
+    @profiled("three_phase_analysis")
+    def perform_analysis(self):
+        self.neutral_voltage = self.calculate_neutral_voltage()
+        neutral = self.neutral_voltage[:, np.newaxis]
+
+        # Cada ramo fica submetido à tensão entre o terminal da fase e o neutro
+        solutions = []
+        for network in self.build_networks(self.voltages - neutral):
+            solution = network.solve()
+            solutions.append(NetworkSolution(*(value.reshape(self.shape + value.shape[1:]) for value in solution)))
+        solution_1, solution_2 = solutions
+
+        self.voltage_matrix_1, self.voltage_matrix_2 = solution_1.voltage_matrix, solution_2.voltage_matrix
+        self.v_low_voltage_1 = solution_1.v_low_voltage + neutral
+        self.v_low_voltage_2 = solution_2.v_low_voltage + neutral
+        self.low_voltage_difference = np.abs(self.v_low_voltage_2 - self.v_low_voltage_1)
+
+        self.reactive_power_matrix_1 = solution_1.reactive_power_matrix
+        self.reactive_power_matrix_2 = solution_2.reactive_power_matrix
+
+        self.low_voltage_reactive_power_1 = solution_1.low_voltage_reactive_power
+        self.low_voltage_reactive_power_2 = solution_2.low_voltage_reactive_power
+
+        self.current_matrix_1, self.i_low_voltage_1 = solution_1.current_matrix, solution_1.i_low_voltage
+        self.current_matrix_2, self.i_low_voltage_2 = solution_2.current_matrix, solution_2.i_low_voltage
+        self.neutral_current = np.sum(self.i_low_voltage_1 + self.i_low_voltage_2, axis=1)
+
+    def case(self, state, phase):
+        # Extrai uma fase de um estado como ImpedanceAnalysis já resolvido, útil para exportar ou exibir
+        index = np.ravel_multi_index((state, phase), self.shape)
+        network_1, network_2 = self.networks
+        analysis = ImpedanceAnalysis(
+            network_1.impedance_matrices[index], network_1.low_voltage_impedance[index],
+            network_2.impedance_matrices[index], network_2.low_voltage_impedance[index],
+            self.voltages[state, phase],
+        )
+        for name in RESULT_ATTRIBUTES:
+            value = getattr(self, name)
+            if value is not None:
+                setattr(analysis, name, value[state, phase])
+        return analysis
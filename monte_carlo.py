@@ -0,0 +1,174 @@
+import argparse
+import json
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from impedance_analysis import BatchImpedanceNetwork
+from compute import resolve_inputs
+
+
+# Simulação de Monte Carlo do desequilíbrio natural do banco: tolerância de fabricação das latas e dos
+# elementos internos somada ao gradiente de temperatura causado pelo aquecimento solar desigual.
+# As amostras são processadas em blocos vetorizados, de modo que a memória de trabalho fica limitada
+# por memory_budget independentemente do número de amostras.
+
+REPORT_QUANTILES = (0.5, 0.9, 0.99, 0.999, 0.9999)
+
+MonteCarloResult = namedtuple("MonteCarloResult", [
+    "low_voltage_difference", "mean", "std", "max", "quantiles",
+])
+
+
+class MonteCarloUnbalance:
+    def __init__(self, capacitance_matrix, capacitance_low_voltage, frequency, v_phase,
+                 nr_serie_internos=1, nr_paralelo_internos=1,
+                 can_tolerance=0.005, element_tolerance=0.0,
+                 max_temperature_rise=15.0, temperature_noise=2.0, temperature_coefficient=-3e-4,
+                 memory_budget=64 * 2 ** 20):
+        # capacitance_matrix: capacitância nominal das latas (F), forma (nr_serie, nr_paralelo), igual nas duas metades
+        # can_tolerance, element_tolerance: desvio padrão relativo da capacitância de latas e elementos
+        # max_temperature_rise: elevação (°C) no lado mais exposto ao sol; a intensidade varia por amostra
+        # temperature_coefficient: variação relativa da capacitância por °C
+        self.capacitance_matrix = np.asarray(capacitance_matrix, dtype=float)
+        self.capacitance_low_voltage = capacitance_low_voltage
+        self.omega = 2 * np.pi * frequency
+        self.v_phase = v_phase
+        self.nr_serie_internos = nr_serie_internos
+        self.nr_paralelo_internos = nr_paralelo_internos
+        self.can_tolerance = can_tolerance
+        self.element_tolerance = element_tolerance
+        self.max_temperature_rise = max_temperature_rise
+        self.temperature_noise = temperature_noise
+        self.temperature_coefficient = temperature_coefficient
+        self.memory_budget = memory_budget
+
+    @classmethod
+    def from_inputs(cls, inputs, **kwargs):
+        inputs = resolve_inputs(inputs)
+        shape = (inputs["nr_serie"], inputs["nr_paralelo"])
+        return cls(
+            np.full(shape, inputs["capacitancia_padrao_uf"] * 1e-6),
+            inputs["capacitancia_baixa_tensao_uf"] * 1e-6,
+            inputs["frequencia"],
+            complex(inputs["tensao_kv"] * 1e3 / np.sqrt(3), 0),
+            nr_serie_internos=inputs["nr_serie_internos"],
+            nr_paralelo_internos=inputs["nr_paralelo_internos"],
+            **kwargs,
+        )
+
+    @property
+    def rack_position(self):
+        # Posição horizontal de cada lata no rack, de 0 (sombra) a 1 (sol): as cadeias das duas metades
+        # ficam lado a lado, forma (2, 1, nr_paralelo)
+        nr_paralelo = self.capacitance_matrix.shape[1]
+        columns = np.arange(2 * nr_paralelo).reshape(2, 1, nr_paralelo)
+        return columns / max(2 * nr_paralelo - 1, 1)
+
+    def chunk_size(self):
+        # Arrays por amostra: latas das duas metades e, se houver tolerância de elementos, todos os elementos
+        cans = 2 * self.capacitance_matrix.size
+        elements = self.nr_serie_internos * self.nr_paralelo_internos if self.element_tolerance > 0 else 1
+        # Algumas cópias em float e complex por lata durante o cálculo
+        bytes_per_sample = cans * (elements * 8 + 6 * 16)
+        return max(1, int(self.memory_budget // bytes_per_sample))
+
+    def sample_capacitances(self, rng, n_samples):
+        shape = (n_samples, 2) + self.capacitance_matrix.shape
+        capacitance = np.broadcast_to(self.capacitance_matrix, shape).copy()
+
+        if self.element_tolerance > 0:
+            # Elementos em paralelo somam, grupos internos em série combinam pelo inverso
+            elements = 1 + self.element_tolerance * rng.standard_normal(
+                shape + (self.nr_serie_internos, self.nr_paralelo_internos))
+            groups = elements.sum(axis=-1) / self.nr_paralelo_internos
+            capacitance *= self.nr_serie_internos / np.sum(1 / groups, axis=-1)
+
+        if self.can_tolerance > 0:
+            capacitance *= 1 + self.can_tolerance * rng.standard_normal(shape)
+
+        # Intensidade do sol por amostra, gradiente ao longo do rack e ruído de temperatura por lata
+        sun = rng.random((n_samples, 1, 1, 1))
+        temperature = self.max_temperature_rise * sun * self.rack_position
+        if self.temperature_noise > 0:
+            temperature = temperature + self.temperature_noise * rng.standard_normal(shape)
+        capacitance *= 1 + self.temperature_coefficient * temperature
+        return capacitance
+
+    def solve_chunk(self, capacitance):
+        impedance = 1 / (1j * self.omega * capacitance)
+        low_voltage_impedance = 1 / (1j * self.omega * self.capacitance_low_voltage)
+        v_low_voltage = []
+        for half in range(2):
+            network = BatchImpedanceNetwork(impedance[:, half], low_voltage_impedance, self.v_phase)
+            total_current, _ = network.calculate_branch_currents()
+            v_low_voltage.append(total_current * low_voltage_impedance)
+        return np.abs(v_low_voltage[1] - v_low_voltage[0])
+
+    def run(self, n_samples, seed=None):
+        rng = np.random.default_rng(seed)
+        low_voltage_difference = np.empty(n_samples)
+        chunk = self.chunk_size()
+        for start in range(0, n_samples, chunk):
+            stop = min(start + chunk, n_samples)
+            low_voltage_difference[start:stop] = self.solve_chunk(self.sample_capacitances(rng, stop - start))
+
+        return MonteCarloResult(
+            low_voltage_difference=low_voltage_difference,
+            mean=float(low_voltage_difference.mean()),
+            std=float(low_voltage_difference.std()),
+            max=float(low_voltage_difference.max()),
+            quantiles=dict(zip(REPORT_QUANTILES, np.quantile(low_voltage_difference, REPORT_QUANTILES).tolist())),
+        )
+
+
+def false_trip_probability(result, setting):
+    # Fração das amostras sem falhas cujo desequilíbrio natural já ultrapassa o ajuste
+    return float(np.mean(result.low_voltage_difference >= setting))
+
+
+def setting_margin(result, setting, quantile=0.9999):
+    # Folga entre o ajuste e o quantil do desequilíbrio natural (positiva = seguro)
+    return float(setting - np.quantile(result.low_voltage_difference, quantile))
+
+
+def main(argv=None):
+    from cli import load_config
+
+    parser = argparse.ArgumentParser(description="Monte Carlo do desequilíbrio natural na tensão do TP")
+    parser.add_argument("--config", help="Arquivo JSON ou YAML com os parâmetros do banco")
+    parser.add_argument("--samples", type=int, default=100000, help="Número de amostras")
+    parser.add_argument("--seed", type=int, default=None, help="Semente do gerador aleatório")
+    parser.add_argument("--can-tolerance", type=float, default=0.005, help="Desvio padrão relativo das latas")
+    parser.add_argument("--element-tolerance", type=float, default=0.0,
+                        help="Desvio padrão relativo dos elementos internos")
+    parser.add_argument("--max-temperature-rise", type=float, default=15.0,
+                        help="Elevação de temperatura no lado exposto ao sol (°C)")
+    parser.add_argument("--setting", type=float, default=None, help="Ajuste de alarme na tensão do TP (V)")
+    args = parser.parse_args(argv)
+
+    inputs = load_config(args.config) if args.config else {}
+    simulator = MonteCarloUnbalance.from_inputs(
+        inputs,
+        can_tolerance=args.can_tolerance,
+        element_tolerance=args.element_tolerance,
+        max_temperature_rise=args.max_temperature_rise,
+    )
+    result = simulator.run(args.samples, seed=args.seed)
+
+    report = {
+        "samples": args.samples,
+        "mean": result.mean,
+        "std": result.std,
+        "max": result.max,
+        "quantiles": {str(q): value for q, value in result.quantiles.items()},
+    }
+    if args.setting is not None:
+        report["false_trip_probability"] = false_trip_probability(result, args.setting)
+        report["setting_margin"] = setting_margin(result, args.setting)
+    sys.stdout.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+from collections import namedtuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import splu
+
+from impedance_analysis import RESULT_ATTRIBUTES
+from profiling import PROFILER
+
+
+# Solver nodal do banco em estrela dividida. Cada lata é uma cadeia de grupos internos em série
+# (nr_paralelo_internos elementos em paralelo por grupo); os nós são as derivações entre grupos e latas,
+# os neutros das duas metades e o TP entre eles. A matriz de admitâncias do banco é fatorada uma
+# única vez e reutilizada para todos os estados de falha:
+#   - elementos abertos em um grupo alteram uma admitância: atualização de posto baixo (Woodbury);
+#   - grupos em curto são restrições v_a = v_b resolvidas pelo complemento de Schur sobre a mesma
+#     fatoração, sem admitâncias sentinela; a corrente no curto é o multiplicador da restrição;
+#   - grupos totalmente abertos removem o ramo da topologia, e nós isolados ficam com tensão NaN.
+
+SOURCE = -1
+GROUND = -2
+
+NodalSolution = namedtuple("NodalSolution", ["node_voltages", "branch_currents"])
+BankSolution = namedtuple("BankSolution", RESULT_ATTRIBUTES)
+
+
+class DisjointSet:
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        self.parent.setdefault(item, item)
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        self.parent[root_b] = root_a
+        return True
+
+
+class NodalNetwork:
+    # Rede genérica de ramos de admitância entre nós desconhecidos 0..n_nodes-1, a fonte (SOURCE, tensão
+    # v_source) e a terra (GROUND). active indica os ramos presentes na topologia.
+    def __init__(self, branch_from, branch_to, admittance, n_nodes, v_source, active=None):
+        self.branch_from = np.asarray(branch_from)
+        self.branch_to = np.asarray(branch_to)
+        self.admittance = np.asarray(admittance, dtype=complex)
+        self.n_nodes = n_nodes
+        self.v_source = v_source
+        self.active = np.ones(len(self.admittance), dtype=bool) if active is None else np.asarray(active)
+
+        self.find_connected_nodes()
+        self.factorize()
+
+    def find_connected_nodes(self):
+        # Nós sem caminho até a fonte ou a terra ficam fora do sistema (tensão indeterminada)
+        source, ground = self.n_nodes, self.n_nodes + 1
+        ends_from = np.where(self.branch_from == SOURCE, source, np.where(self.branch_from == GROUND, ground,
+                                                                          self.branch_from))
+        ends_to = np.where(self.branch_to == SOURCE, source, np.where(self.branch_to == GROUND, ground,
+                                                                      self.branch_to))
+        active = self.active
+        graph = coo_matrix((np.ones(active.sum()), (ends_from[active], ends_to[active])),
+                           shape=(self.n_nodes + 2, self.n_nodes + 2))
+        _, labels = connected_components(graph, directed=False)
+        connected = (labels == labels[source]) | (labels == labels[ground])
+
+        self.connected = connected[:self.n_nodes]
+        self.reduced_index = np.full(self.n_nodes, -1)
+        self.reduced_index[self.connected] = np.arange(self.connected.sum())
+        self.n_reduced = int(self.connected.sum())
+        # Ramos que participam do sistema: ativos e com as duas pontas conectadas
+        connected_ends = np.append(connected, [True, True])
+        self.live = active & connected_ends[ends_from] & connected_ends[ends_to]
+
+    def reduced(self, nodes):
+        # Índice no sistema reduzido; SOURCE e GROUND são mantidos
+        nodes = np.asarray(nodes)
+        return np.where(nodes >= 0, self.reduced_index[np.maximum(nodes, 0)], nodes)
+
+    def factorize(self):
+        PROFILER.count("factorizations")
+        live = self.live
+        y = self.admittance[live]
+        a, b = self.reduced(self.branch_from[live]), self.reduced(self.branch_to[live])
+        both = (a >= 0) & (b >= 0)
+        rows = np.concatenate([a[a >= 0], b[b >= 0], a[both], b[both]])
+        cols = np.concatenate([a[a >= 0], b[b >= 0], b[both], a[both]])
+        values = np.concatenate([y[a >= 0], y[b >= 0], -y[both], -y[both]])
+        matrix = coo_matrix((values, (rows, cols)), shape=(self.n_reduced, self.n_reduced)).tocsc()
+        self.factor = splu(matrix)
+
+        # Ramos ligados à fonte injetam y * v_source no nó da outra ponta
+        rhs = np.zeros(self.n_reduced, dtype=complex)
+        from_source = (a == SOURCE) & (b >= 0)
+        to_source = (b == SOURCE) & (a >= 0)
+        np.add.at(rhs, b[from_source], y[from_source] * self.v_source)
+        np.add.at(rhs, a[to_source], y[to_source] * self.v_source)
+        self.rhs = rhs
+
+    def incidence(self, branch):
+        # Vetor de incidência do ramo sobre os nós do sistema e a contribuição das pontas conhecidas
+        column = np.zeros(self.n_reduced, dtype=complex)
+        known = 0j
+        for node, sign in ((self.branch_from[branch], 1), (self.branch_to[branch], -1)):
+            reduced = int(self.reduced(node))
+            if reduced >= 0:
+                column[reduced] = sign
+            elif node == SOURCE:
+                known += sign * self.v_source
+        return column, known
+
+    def solve(self, short_branches=(), admittance_changes=None):
+        shorted = set(short_branches)
+        admittance_changes = {branch: dy for branch, dy in (admittance_changes or {}).items()
+                              if dy != 0 and self.live[branch] and branch not in shorted}
+
+        # Atualização de Woodbury: (Y + U D U^T)^-1 a partir da fatoração de Y
+        rhs = self.rhs.copy()
+        update = None
+        if admittance_changes:
+            branches = list(admittance_changes)
+            delta = np.array([admittance_changes[branch] for branch in branches])
+            columns, known = zip(*(self.incidence(branch) for branch in branches))
+            u = np.column_stack(columns)
+            # Ramo ligado à fonte também altera o vetor de injeções
+            rhs -= u @ (delta * np.array(known))
+            w = self.factor.solve(u)
+            capacitance = np.diag(1 / delta) + u.T @ w
+            update = (u, w, capacitance)
+
+        def apply_inverse(vectors):
+            z = self.factor.solve(vectors)
+            if update is not None:
+                u, w, capacitance = update
+                z = z - w @ np.linalg.solve(capacitance, u.T @ z)
+            return z
+
+        # Curtos redundantes (pontas já unidas por outros curtos) não geram restrição
+        joined = DisjointSet()
+        constraints = []
+        for branch in short_branches:
+            if not self.live[branch]:
+                continue
+            if not joined.union(int(self.branch_from[branch]), int(self.branch_to[branch])):
+                continue
+            constraints.append(branch)
+        if joined.find(SOURCE) == joined.find(GROUND):
+            raise ValueError("Os curtos-circuitos ligam a fase diretamente à terra")
+
+        base = apply_inverse(rhs)
+        multipliers = np.zeros(0, dtype=complex)
+        if constraints:
+            columns, known = zip(*(self.incidence(branch) for branch in constraints))
+            c = np.column_stack(columns)
+            inverse_c = apply_inverse(c)
+            multipliers = np.linalg.solve(c.T @ inverse_c, c.T @ base + np.array(known))
+            base = base - inverse_c @ multipliers
+
+        node_voltages = np.full(self.n_nodes, np.nan, dtype=complex)
+        node_voltages[self.connected] = base
+
+        branch_voltages = self.branch_voltages(node_voltages)
+        admittance = self.admittance.copy()
+        for branch, dy in admittance_changes.items():
+            admittance[branch] += dy
+        branch_currents = np.where(self.live, admittance * branch_voltages, 0)
+        for branch in short_branches:
+            branch_currents[branch] = 0
+        branch_currents[constraints] = multipliers
+        return NodalSolution(node_voltages=node_voltages, branch_currents=branch_currents)
+
+    def branch_voltages(self, node_voltages):
+        extended = np.append(node_voltages, [self.v_source, 0])
+        ends_from = np.where(self.branch_from < 0, self.n_nodes - 1 - self.branch_from, self.branch_from)
+        ends_to = np.where(self.branch_to < 0, self.n_nodes - 1 - self.branch_to, self.branch_to)
+        return extended[ends_from] - extended[ends_to]
+
+
+class NodalBankSolver:
+    # Mesmas entradas de ImpedanceAnalysis mais a composição interna das latas. ties lista pares
+    # (metade, lata) em que as cadeias em paralelo daquela metade são interligadas abaixo da lata.
+    # pt_impedance é a impedância do TP entre os neutros (None = voltímetro ideal).
+    def __init__(self, impedance_matrix_1, low_voltage_impedance_1, impedance_matrix_2, low_voltage_impedance_2,
+                 v_phase, nr_serie_internos, nr_paralelo_internos, ties=(), pt_impedance=None):
+        self.impedance_matrices = np.stack([np.asarray(impedance_matrix_1, dtype=complex),
+                                            np.asarray(impedance_matrix_2, dtype=complex)])
+        self.low_voltage_impedances = np.array([low_voltage_impedance_1, low_voltage_impedance_2], dtype=complex)
+        self.v_phase = complex(v_phase)
+        self.nr_serie_internos = nr_serie_internos
+        self.nr_paralelo_internos = nr_paralelo_internos
+        self.ties = set(ties)
+        self.pt_impedance = pt_impedance
+        self.build_topology()
+        self.networks = {}
+        self.base_network = self.network_without(frozenset())
+
+    def build_topology(self):
+        _, nr_serie, nr_paralelo = self.impedance_matrices.shape
+        nr_serie_internos = self.nr_serie_internos
+
+        # Nós provisórios: 0 e 1 são os neutros; as derivações ligadas por ties são unidas depois
+        nodes = DisjointSet()
+        next_node = 2
+        group_ends = np.zeros((2, nr_serie, nr_paralelo, nr_serie_internos, 2), dtype=int)
+        for half in range(2):
+            for col in range(nr_paralelo):
+                above = SOURCE
+                for row in range(nr_serie):
+                    for group in range(nr_serie_internos):
+                        if row == nr_serie - 1 and group == nr_serie_internos - 1:
+                            below = half
+                        else:
+                            below = next_node
+                            next_node += 1
+                        group_ends[half, row, col, group] = above, below
+                        above = below
+        for half, row in self.ties:
+            bottoms = group_ends[half, row, :, -1, 1]
+            for node in bottoms[1:]:
+                nodes.union(int(bottoms[0]), int(node))
+
+        # Renumeração compacta após as uniões
+        roots = {}
+        relabel = np.array([roots.setdefault(nodes.find(node), len(roots)) for node in range(next_node)])
+        group_ends = np.where(group_ends >= 0, relabel[np.maximum(group_ends, 0)], group_ends)
+        self.neutral_nodes = relabel[[0, 1]]
+        self.n_nodes = len(roots)
+
+        # Ramos: grupos internos, capacitores de baixa tensão e, opcionalmente, o TP
+        group_impedance = self.impedance_matrices / nr_serie_internos
+        self.element_admittance = 1 / (group_impedance * self.nr_paralelo_internos)
+        group_admittance = np.broadcast_to((1 / group_impedance)[..., np.newaxis], group_ends.shape[:-1])
+
+        branch_from = [group_ends[..., 0].ravel(), self.neutral_nodes]
+        branch_to = [group_ends[..., 1].ravel(), [GROUND, GROUND]]
+        admittance = [group_admittance.ravel(), 1 / self.low_voltage_impedances]
+        if self.pt_impedance is not None:
+            branch_from.append([self.neutral_nodes[0]])
+            branch_to.append([self.neutral_nodes[1]])
+            admittance.append([1 / self.pt_impedance])
+        self.branch_from = np.concatenate(branch_from)
+        self.branch_to = np.concatenate(branch_to)
+        self.branch_admittance = np.concatenate(admittance)
+
+        self.group_shape = group_ends.shape[:-1]
+        self.group_branches = np.arange(group_ends[..., 0].size).reshape(self.group_shape)
+        self.low_voltage_branches = group_ends[..., 0].size + np.arange(2)
+
+    def network_without(self, open_branches):
+        # Uma fatoração por topologia distinta (grupos totalmente abertos), guardada para reuso
+        if open_branches not in self.networks:
+            active = np.ones(len(self.branch_admittance), dtype=bool)
+            active[list(open_branches)] = False
+            self.networks[open_branches] = NodalNetwork(self.branch_from, self.branch_to, self.branch_admittance,
+                                                        self.n_nodes, self.v_phase, active)
+        return self.networks[open_branches]
+
+    def solve(self, shorts=(), opens=None):
+        # shorts: grupos (metade, lata, cadeia, grupo) em curto; opens: {(metade, lata, cadeia, grupo): n}
+        # com o número de elementos abertos no grupo. Curto prevalece sobre abertura no mesmo grupo.
+        PROFILER.count("states_solved")
+        short_branches = [int(self.group_branches[key]) for key in shorts]
+        open_branches = set()
+        admittance_changes = {}
+        for key, n_open in (opens or {}).items():
+            branch = int(self.group_branches[key])
+            if branch in short_branches:
+                continue
+            if n_open >= self.nr_paralelo_internos:
+                open_branches.add(branch)
+            elif n_open > 0:
+                admittance_changes[branch] = -n_open * self.element_admittance[key[:3]]
+
+        network = self.network_without(frozenset(open_branches))
+        solution = network.solve(short_branches, admittance_changes)
+        return self.bank_solution(network, solution, admittance_changes)
+
+    def bank_solution(self, network, solution, admittance_changes):
+        branch_voltages = network.branch_voltages(solution.node_voltages)
+        admittance = self.branch_admittance.copy()
+        for branch, dy in admittance_changes.items():
+            admittance[branch] += dy
+        admittance[~network.live] = 0
+
+        group_voltages = branch_voltages[self.group_branches]
+        # Potência reativa no ramo: |V|^2 * Im(1/y) * |y|^2 = -|V|^2 * Im(y); nula em ramos em curto
+        group_reactive = np.nan_to_num(-(np.abs(group_voltages) ** 2) * admittance[self.group_branches].imag)
+        # Os grupos de uma lata estão em série: a corrente da lata é a do primeiro grupo
+        can_voltages = np.sum(group_voltages, axis=-1)
+        can_currents = solution.branch_currents[self.group_branches[..., 0]]
+        can_reactive = np.sum(group_reactive, axis=-1)
+
+        v_low_voltage = solution.node_voltages[self.neutral_nodes]
+        i_low_voltage = solution.branch_currents[self.low_voltage_branches]
+        low_voltage_reactive = (np.abs(i_low_voltage) ** 2) * self.low_voltage_impedances.imag
+
+        return BankSolution(
+            voltage_matrix_1=can_voltages[0], voltage_matrix_2=can_voltages[1],
+            reactive_power_matrix_1=can_reactive[0], reactive_power_matrix_2=can_reactive[1],
+            current_matrix_1=can_currents[0], current_matrix_2=can_currents[1],
+            v_low_voltage_1=v_low_voltage[0], v_low_voltage_2=v_low_voltage[1],
+            i_low_voltage_1=i_low_voltage[0], i_low_voltage_2=i_low_voltage[1],
+            low_voltage_difference=np.abs(v_low_voltage[1] - v_low_voltage[0]),
+            low_voltage_reactive_power_1=low_voltage_reactive[0],
+            low_voltage_reactive_power_2=low_voltage_reactive[1],
+        )
@@ -0,0 +1,209 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+
+# Instrumentação opcional do pipeline: intervalos de tempo nomeados (span), contadores por solução (count)
+# e exportação do registro como trace do Chrome (chrome://tracing, Perfetto) ou do speedscope.
+# Cada execução grava no seu próprio Profiler, ativado no contexto atual (contextvars): sessões simultâneas
+# do Streamlit não compartilham registros. Sem profiler ativo, span devolve um contexto vazio e count
+# retorna logo, sem custo perceptível.
+#   profiler = Profiler(trace_memory=True)
+#   with profiler.recording():
+#       ...
+#   profiler.write_trace("perfil.json")          # ou perfil.speedscope.json
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+_DISABLED = nullcontext()
+
+_active_profiler = contextvars.ContextVar("active_profiler", default=None)
+
+# tracemalloc é global ao processo: fica ligado enquanto alguma gravação com memória estiver ativa
+_memory_lock = threading.Lock()
+_memory_recordings = 0
+_memory_started = False
+
+
+def _start_memory_tracing():
+    global _memory_recordings, _memory_started
+    with _memory_lock:
+        if _memory_recordings == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _memory_started = True
+        _memory_recordings += 1
+
+
+def _stop_memory_tracing():
+    global _memory_recordings, _memory_started
+    with _memory_lock:
+        _memory_recordings -= 1
+        # Só desliga se foi ligado aqui, para não interferir com quem já usava tracemalloc
+        if _memory_recordings == 0 and _memory_started:
+            tracemalloc.stop()
+            _memory_started = False
+
+
+class Profiler:
+    def __init__(self, trace_memory=False):
+        # trace_memory: registra os bytes alocados em cada intervalo (tracemalloc, mais lento). Como a
+        # memória é medida no processo todo, execuções simultâneas entram na conta umas das outras.
+        self.trace_memory = trace_memory
+        self.spans = []
+        self.counters = Counter()
+        self.origin = time.perf_counter()
+        self.created = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def recording(self):
+        # Ativa este profiler no contexto atual; intervalos e contadores de outros contextos não entram
+        token = _active_profiler.set(self)
+        if self.trace_memory:
+            _start_memory_tracing()
+        try:
+            yield self
+        finally:
+            if self.trace_memory:
+                _stop_memory_tracing()
+            _active_profiler.reset(token)
+
+    def span(self, name, **args):
+        return self._span(name, args)
+
+    @contextmanager
+    def _span(self, name, args):
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        trace_memory = self.trace_memory and tracemalloc.is_tracing()
+        if trace_memory:
+            memory_start = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._local.depth = depth
+            if trace_memory:
+                # Saldo de memória alocada e ainda não liberada ao fim do intervalo
+                allocated = tracemalloc.get_traced_memory()[0] - memory_start
+                args = dict(args, allocated_bytes=allocated)
+                if depth == 0:
+                    self.count("allocated_bytes", max(allocated, 0))
+            with self._lock:
+                self.spans.append({
+                    "name": name,
+                    "start": start - self.origin,
+                    "duration": end - start,
+                    "depth": depth,
+                    "thread": threading.get_ident(),
+                    "args": args,
+                })
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def summary(self):
+        # Tempo total, número de chamadas e tempo médio por nome de intervalo, em ordem de tempo total
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            total = totals.setdefault(span["name"], {"name": span["name"], "calls": 0, "total_s": 0.0})
+            total["calls"] += 1
+            total["total_s"] += span["duration"]
+        for total in totals.values():
+            total["mean_s"] = total["total_s"] / total["calls"]
+        return sorted(totals.values(), key=lambda total: total["total_s"], reverse=True)
+
+    def chrome_trace(self):
+        # Eventos completos ("X") em microssegundos e o valor final de cada contador ("C")
+        pid = os.getpid()
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        events = [{
+            "name": span["name"], "ph": "X", "pid": pid, "tid": span["thread"],
+            "ts": span["start"] * 1e6, "dur": span["duration"] * 1e6, "args": span["args"],
+        } for span in spans]
+        end = max((span["start"] + span["duration"] for span in spans), default=0.0)
+        events.extend({"name": name, "ph": "C", "pid": pid, "ts": end * 1e6, "args": {name: value}}
+                      for name, value in counters.items())
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"counters": counters}}
+
+    def speedscope(self):
+        # Perfil "evented" por thread: abertura (O) e fechamento (C) de cada intervalo em ordem temporal
+        with self._lock:
+            spans = list(self.spans)
+        frames = []
+        frame_index = {}
+        profiles = []
+        for thread in sorted({span["thread"] for span in spans}):
+            events = []
+            for span in spans:
+                if span["thread"] != thread:
+                    continue
+                frame = frame_index.setdefault(span["name"], len(frames))
+                if frame == len(frames):
+                    frames.append({"name": span["name"]})
+                # Fechamentos antes de aberturas no mesmo instante; intervalos externos abrem primeiro
+                events.append((span["start"], 1, span["depth"], "O", frame))
+                events.append((span["start"] + span["duration"], 0, -span["depth"], "C", frame))
+            events.sort()
+            profiles.append({
+                "type": "evented",
+                "name": f"thread {thread}",
+                "unit": "seconds",
+                "startValue": events[0][0],
+                "endValue": events[-1][0],
+                "events": [{"type": kind, "frame": frame, "at": at} for at, _, _, kind, frame in events],
+            })
+        return {"$schema": SPEEDSCOPE_SCHEMA, "shared": {"frames": frames}, "profiles": profiles,
+                "name": "ProtecaoDiferencialTensao"}
+
+    def write_trace(self, path):
+        # O formato segue a extensão: *.speedscope.json para o speedscope, qualquer outra para o Chrome
+        trace = self.speedscope() if path.endswith(".speedscope.json") else self.chrome_trace()
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(trace, file)
+        return path
+
+
+class ActiveProfiler:
+    # Ponto de acesso usado pela instrumentação: repassa ao profiler ativo no contexto atual, se houver
+    def span(self, name, **args):
+        profiler = _active_profiler.get()
+        if profiler is None:
+            return _DISABLED
+        return profiler.span(name, **args)
+
+    def count(self, name, value=1):
+        profiler = _active_profiler.get()
+        if profiler is not None:
+            profiler.count(name, value)
+
+    @property
+    def current(self):
+        return _active_profiler.get()
+
+
+PROFILER = ActiveProfiler()
+
+
+def profiled(name):
+    # Decorador: envolve a função em um intervalo nomeado do PROFILER
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with PROFILER.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
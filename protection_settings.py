@@ -0,0 +1,205 @@
+import argparse
+import json
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from impedance_analysis import ImpedanceAnalysis
+from compute import resolve_inputs, build_bank, to_json_value
+
+
+# Cálculo inverso dos ajustes da proteção de desequilíbrio (IEEE C37.99): em vez de varrer todos os
+# estados de falha e ler a tabela, busca-se por bisseção o menor número de grupos internos em curto que
+# atinge cada critério. Cada local de falha é uma cadeia (metade, paralelo) em que as falhas se acumulam
+# lata a lata, na mesma ordem da varredura sequencial. A bisseção supõe que a tensão no TP e a sobretensão
+# nos elementos crescem com o número de falhas, o que vale para metades inicialmente equilibradas.
+
+LOCATION_AXES = ("half", "paralelo")
+
+# Critério não atingido dentro do número máximo de falhas da cadeia
+NOT_FOUND = -1
+
+ProtectionSettings = namedtuple("ProtectionSettings", [
+    "alarm_setting", "trip_setting", "natural_unbalance",
+    "alarm_failures", "trip_failures",
+    "min_detectable_failures", "trip_operating_failures",
+    "alarm_sensitivity_met", "trip_sensitivity_met",
+    "n_solves",
+])
+
+
+def shorted_groups(shape, nr_serie_internos, location, n_failed):
+    # Grupos em curto por lata, forma shape = (2, nr_serie, nr_paralelo): as latas da cadeia location são
+    # preenchidas em ordem
+    half, paralelo = location
+    shorted = np.zeros(shape, dtype=int)
+    offsets = nr_serie_internos * np.arange(shape[1])
+    shorted[half, :, paralelo] = np.clip(n_failed - offsets, 0, nr_serie_internos)
+    return shorted
+
+
+class ProtectionSettingSolver:
+    def __init__(self, impedance_matrix_1, low_voltage_impedance_1, impedance_matrix_2, low_voltage_impedance_2,
+                 v_phase, nr_serie_internos, tensao_lata,
+                 alarm_limit=None, trip_limit=1.10, sensitivity_margin=0.5, inherent_unbalance=0.0):
+        # alarm_limit, trip_limit: sobretensão (pu da tensão nominal dos elementos) que deve ser sinalizada;
+        #   alarm_limit=None alarma na primeira falha
+        # sensitivity_margin: fração do sinal no estado crítico abaixo da qual o ajuste é colocado; o
+        #   desequilíbrio natural deve ficar abaixo do ajuste pela mesma margem
+        # inherent_unbalance: desequilíbrio natural adicional na tensão do TP (V), p. ex. de monte_carlo.py
+        if not 0 <= sensitivity_margin < 1:
+            raise ValueError("sensitivity_margin deve estar em [0, 1)")
+        self.impedance_matrices = np.stack([np.asarray(impedance_matrix_1, dtype=complex),
+                                            np.asarray(impedance_matrix_2, dtype=complex)])
+        self.low_voltage_impedances = (low_voltage_impedance_1, low_voltage_impedance_2)
+        self.v_phase = v_phase
+        self.nr_serie_internos = int(nr_serie_internos)
+        self.tensao_lata = tensao_lata
+        self.alarm_limit = alarm_limit
+        self.trip_limit = trip_limit
+        self.sensitivity_margin = sensitivity_margin
+        self.inherent_unbalance = inherent_unbalance
+        self._states = {}
+
+    @classmethod
+    def from_inputs(cls, inputs, **kwargs):
+        bank = build_bank(resolve_inputs(inputs))
+        return cls(bank.impedance_matrix, bank.impedancia_bt, bank.impedance_matrix, bank.impedancia_bt,
+                   bank.v_phase, bank.nr_serie_internos, bank.tensao_lata, **kwargs)
+
+    @property
+    def locations(self):
+        return [(half, paralelo) for half in range(2) for paralelo in range(self.impedance_matrices.shape[2])]
+
+    @property
+    def max_failures(self):
+        # A última lata da cadeia permanece sã
+        return self.nr_serie_internos * (self.impedance_matrices.shape[1] - 1)
+
+    def shorted_groups(self, location, n_failed):
+        return shorted_groups(self.impedance_matrices.shape, self.nr_serie_internos, location, n_failed)
+
+    def evaluate(self, location, n_failed):
+        # (tensão no TP, maior tensão nos elementos em serviço em pu); cada estado é resolvido uma única vez
+        key = (location if n_failed else None, n_failed)
+        if key not in self._states:
+            nr_serie_internos = self.nr_serie_internos
+            remaining = nr_serie_internos - self.shorted_groups(location, n_failed)
+            matrices = self.impedance_matrices * (remaining / nr_serie_internos)
+
+            analysis = ImpedanceAnalysis(matrices[0], self.low_voltage_impedances[0],
+                                         matrices[1], self.low_voltage_impedances[1], self.v_phase)
+            analysis.perform_analysis()
+
+            # Os grupos restantes de cada lata dividem a tensão da lata
+            can_voltage = np.abs(np.stack([analysis.voltage_matrix_1, analysis.voltage_matrix_2]))
+            in_service = remaining > 0
+            element_voltage = can_voltage[in_service] * nr_serie_internos / remaining[in_service]
+            self._states[key] = (float(analysis.low_voltage_difference),
+                                 float(element_voltage.max() / self.tensao_lata))
+        return self._states[key]
+
+    def first_failure_count(self, location, condition):
+        # Menor número de grupos em curto em [1, max_failures] que satisfaz condition(tensão_tp, sobretensão)
+        low, high = 1, self.max_failures
+        if high < 1 or not condition(*self.evaluate(location, high)):
+            return NOT_FOUND
+        while low < high:
+            middle = (low + high) // 2
+            if condition(*self.evaluate(location, middle)):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def failure_counts(self, condition):
+        counts = np.full(self.impedance_matrices.shape[::2], NOT_FOUND)
+        for location in self.locations:
+            counts[location] = self.first_failure_count(location, condition)
+        return counts
+
+    def critical_signal(self, failures):
+        # Menor tensão no TP entre os estados críticos de todos os locais (o ajuste deve operar em todos)
+        signals = [self.evaluate(location, failures[location])[0]
+                   for location in self.locations if failures[location] != NOT_FOUND]
+        return min(signals) if signals else np.nan
+
+    @staticmethod
+    def sensitivity_met(operating_failures, critical_failures):
+        # Por local: o ajuste opera até o estado crítico. Quando o piso de segurança supera o limite de
+        # sensibilidade, o ajuste fica acima do sinal crítico e o local é marcado como não atendido.
+        # Locais sem estado crítico não exigem operação.
+        operates = (operating_failures != NOT_FOUND) & (operating_failures <= critical_failures)
+        return operates | (critical_failures == NOT_FOUND)
+
+    def run(self):
+        margin = self.sensitivity_margin
+        natural_unbalance = max(self.evaluate(self.locations[0], 0)[0], self.inherent_unbalance)
+
+        if self.alarm_limit is None:
+            alarm_failures = np.full(self.impedance_matrices.shape[::2], 1 if self.max_failures else NOT_FOUND)
+        else:
+            alarm_failures = self.failure_counts(lambda pt, overvoltage: overvoltage > self.alarm_limit)
+        trip_failures = self.failure_counts(lambda pt, overvoltage: overvoltage > self.trip_limit)
+
+        # Sensibilidade: abaixo do sinal crítico pela margem; segurança: acima do desequilíbrio natural.
+        # Sem estado crítico em nenhum local, o sinal crítico é nan e vale só o piso (fmax ignora nan)
+        security_floor = natural_unbalance / (1 - margin)
+        alarm_setting = float(np.fmax((1 - margin) * self.critical_signal(alarm_failures), security_floor))
+        trip_setting = float(np.fmax(np.fmax((1 - margin) * self.critical_signal(trip_failures), security_floor),
+                                     alarm_setting))
+        min_detectable_failures = self.failure_counts(lambda pt, overvoltage: pt >= alarm_setting)
+        trip_operating_failures = self.failure_counts(lambda pt, overvoltage: pt >= trip_setting)
+
+        return ProtectionSettings(
+            alarm_setting=alarm_setting,
+            trip_setting=trip_setting,
+            natural_unbalance=natural_unbalance,
+            alarm_failures=alarm_failures,
+            trip_failures=trip_failures,
+            min_detectable_failures=min_detectable_failures,
+            trip_operating_failures=trip_operating_failures,
+            alarm_sensitivity_met=self.sensitivity_met(min_detectable_failures, alarm_failures),
+            trip_sensitivity_met=self.sensitivity_met(trip_operating_failures, trip_failures),
+            n_solves=len(self._states),
+        )
+
+
+def main(argv=None):
+    from cli import load_config
+
+    parser = argparse.ArgumentParser(description="Ajustes de alarme e trip da proteção de desequilíbrio")
+    parser.add_argument("--config", help="Arquivo JSON ou YAML com os parâmetros do banco")
+    parser.add_argument("--alarm-limit", type=float, default=None,
+                        help="Sobretensão nos elementos para alarme (pu; padrão: primeira falha)")
+    parser.add_argument("--trip-limit", type=float, default=1.10, help="Sobretensão nos elementos para trip (pu)")
+    parser.add_argument("--margin", type=float, default=0.5, help="Margem de sensibilidade (fração do sinal)")
+    parser.add_argument("--inherent-unbalance", type=float, default=0.0,
+                        help="Desequilíbrio natural adicional na tensão do TP (V)")
+    args = parser.parse_args(argv)
+
+    inputs = load_config(args.config) if args.config else {}
+    try:
+        solver = ProtectionSettingSolver.from_inputs(
+            inputs,
+            alarm_limit=args.alarm_limit,
+            trip_limit=args.trip_limit,
+            sensitivity_margin=args.margin,
+            inherent_unbalance=args.inherent_unbalance,
+        )
+    except ValueError as error:
+        raise SystemExit(f"Erro nas entradas: {error}")
+    settings = solver.run()
+
+    report = {"axes": list(LOCATION_AXES)}
+    for name, value in settings._asdict().items():
+        report[name] = to_json_value(value)
+    sys.stdout.write(json.dumps(report, indent=2, allow_nan=False) + "\n")
+    if not (settings.alarm_sensitivity_met.all() and settings.trip_sensitivity_met.all()):
+        sys.stderr.write("Aviso: o desequilíbrio natural impede detectar o estado crítico em alguns locais "
+                         "(alarm_sensitivity_met/trip_sensitivity_met)\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import json
+import os
+
+import numpy as np
+
+from profiling import profiled
+
+
+# Exportação colunar incremental dos resultados: cada tabela é gravada em blocos de linhas em Parquet,
+# Arrow IPC ou arquivos .npy mapeados em memória, sem montar DataFrames. Um manifest.json descreve as
+# tabelas para que ferramentas externas abram estudos grandes sem carregar tudo na RAM (load_table).
+# O Excel continua disponível como resumo opcional via ImpedanceAnalysis.export_to_excel.
+
+EXPORT_FORMATS = ("parquet", "arrow", "npy")
+MANIFEST_NAME = "manifest.json"
+FILE_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Os formatos 'parquet' e 'arrow' requerem o pacote pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+class ParquetSink:
+    # Blocos pequenos são acumulados até formar um row group de tamanho razoável
+    row_group_rows = 2 ** 16
+
+    def __init__(self, path):
+        self.pa = _import_pyarrow()
+        self.path = path
+        self.writer = None
+        self.pending = []
+        self.pending_rows = 0
+
+    def write(self, columns):
+        batch = self.pa.record_batch(columns)
+        if self.writer is None:
+            self.writer = self.pa.parquet.ParquetWriter(self.path, batch.schema)
+        self.pending.append(batch)
+        self.pending_rows += batch.num_rows
+        if self.pending_rows >= self.row_group_rows:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.writer.write_table(self.pa.Table.from_batches(self.pending))
+            self.pending = []
+            self.pending_rows = 0
+
+    def close(self):
+        if self.writer is not None:
+            self.flush()
+            self.writer.close()
+
+
+class ArrowSink:
+    def __init__(self, path):
+        self.pa = _import_pyarrow()
+        self.path = path
+        self.sink = None
+        self.writer = None
+
+    def write(self, columns):
+        batch = self.pa.record_batch(columns)
+        if self.writer is None:
+            self.sink = self.pa.OSFile(self.path, "wb")
+            self.writer = self.pa.ipc.new_file(self.sink, batch.schema)
+        self.writer.write_batch(batch)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.sink.close()
+
+
+class NpySink:
+    # Um .npy por coluna, pré-alocado com n_rows linhas e preenchido por fatias via memmap
+    def __init__(self, path, n_rows):
+        if n_rows is None:
+            raise ValueError("O formato 'npy' requer o número de linhas da tabela (n_rows)")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.n_rows = n_rows
+        self.arrays = {}
+
+    def write(self, columns, offset):
+        for name, values in columns.items():
+            if name not in self.arrays:
+                self.arrays[name] = np.lib.format.open_memmap(
+                    os.path.join(self.path, f"{name}.npy"), mode="w+", dtype=values.dtype, shape=(self.n_rows,))
+            self.arrays[name][offset:offset + len(values)] = values
+
+    def close(self):
+        for array in self.arrays.values():
+            array.flush()
+        self.arrays.clear()
+
+
+class TableWriter:
+    def __init__(self, exporter, name, n_rows=None, metadata=None):
+        self.exporter = exporter
+        self.name = name
+        self.rows = 0
+        self.columns = None
+        self.metadata = dict(metadata or {})
+        path = os.path.join(exporter.directory, name + FILE_EXTENSIONS.get(exporter.format, ""))
+        self.path = path
+        if exporter.format == "parquet":
+            self.sink = ParquetSink(path)
+        elif exporter.format == "arrow":
+            self.sink = ArrowSink(path)
+        else:
+            self.sink = NpySink(path, n_rows)
+
+    def append(self, **columns):
+        columns = {name: np.ascontiguousarray(values).ravel() for name, values in columns.items()}
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError(f"Colunas da tabela '{self.name}' com comprimentos diferentes")
+        if self.columns is None:
+            self.columns = list(columns)
+        elif list(columns) != self.columns:
+            raise ValueError(f"Colunas da tabela '{self.name}' diferentes das do primeiro bloco")
+
+        if isinstance(self.sink, NpySink):
+            self.sink.write(columns, self.rows)
+        else:
+            self.sink.write(columns)
+        self.rows += lengths.pop()
+
+    def close(self, complete=True):
+        # Os arquivos são sempre fechados; só tabelas completas entram no manifesto
+        self.sink.close()
+        if not complete:
+            return
+        self.exporter.tables[self.name] = {
+            "path": os.path.relpath(self.path, self.exporter.directory),
+            "rows": self.rows,
+            "columns": self.columns or [],
+            "metadata": self.metadata,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close(complete=exc_info[0] is None)
+
+
+class ResultExporter:
+    def __init__(self, directory, file_format="parquet"):
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportação deve ser um de {EXPORT_FORMATS}")
+        if file_format != "npy":
+            _import_pyarrow()
+        os.makedirs(directory, exist_ok=True)
+        # Um manifesto anterior deixa de valer assim que os arquivos começam a ser sobrescritos
+        manifest_path = os.path.join(directory, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            os.unlink(manifest_path)
+        self.directory = directory
+        self.format = file_format
+        self.tables = {}
+
+    def table(self, name, n_rows=None, metadata=None):
+        return TableWriter(self, name, n_rows=n_rows, metadata=metadata)
+
+    def write_manifest(self):
+        with open(os.path.join(self.directory, MANIFEST_NAME), "w", encoding="utf-8") as file:
+            json.dump({"format": self.format, "tables": self.tables}, file, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # Sem manifesto, uma exportação interrompida não é lida como completa por load_table
+        if exc_info[0] is None:
+            self.write_manifest()
+
+
+def export_analysis(analysis, exporter, frequency):
+    # Tensões, correntes, potências reativas e capacitâncias das duas metades de um ImpedanceAnalysis resolvido
+    networks = ((1, analysis.network_1, analysis.voltage_matrix_1, analysis.current_matrix_1,
+                 analysis.reactive_power_matrix_1),
+                (2, analysis.network_2, analysis.voltage_matrix_2, analysis.current_matrix_2,
+                 analysis.reactive_power_matrix_2))
+    nr_serie, nr_paralelo = analysis.network_1.impedance_matrix.shape
+    serie, paralelo = np.indices((nr_serie, nr_paralelo)) + 1
+
+    with exporter.table("network", n_rows=2 * nr_serie * nr_paralelo) as table:
+        for number, network, voltage, current, reactive_power in networks:
+            table.append(
+                network=np.full(serie.size, number),
+                serie=serie,
+                paralelo=paralelo,
+                voltage=np.abs(voltage),
+                current=np.abs(current),
+                reactive_power=reactive_power,
+                capacitance=network.calculate_capacitance_matrix(frequency),
+            )
+
+    omega = 2 * np.pi * frequency
+    low_voltage_impedances = np.array([analysis.low_voltage_impedance_1, analysis.low_voltage_impedance_2])
+    with exporter.table("low_voltage", n_rows=2) as table:
+        table.append(
+            network=np.array([1, 2]),
+            voltage=np.abs([analysis.v_low_voltage_1, analysis.v_low_voltage_2]),
+            current=np.abs([analysis.i_low_voltage_1, analysis.i_low_voltage_2]),
+            reactive_power=np.array([analysis.low_voltage_reactive_power_1, analysis.low_voltage_reactive_power_2]),
+            capacitance=-1 / (np.imag(low_voltage_impedances) * omega),
+            low_voltage_difference=np.full(2, analysis.low_voltage_difference),
+        )
+
+
+def export_sequential_sweep(result, exporter):
+    n_steps, n_elements = result.voltage_pu_1.shape
+    with exporter.table("sweep_steps", n_rows=n_steps) as table:
+        table.append(
+            failed_elements=result.failed_elements,
+            potential_transformer_ddp=result.potential_transformer_ddp,
+            voltage_healthy_capacitors=result.voltage_healthy_capacitors,
+            total_reactive_power=result.total_reactive_power,
+        )
+
+    # Histórico completo por elemento, um bloco por passo da varredura
+    element = np.arange(n_elements)
+    with exporter.table("sweep_elements", n_rows=n_steps * n_elements,
+                        metadata={"n_elements": n_elements}) as table:
+        for step in range(n_steps):
+            table.append(
+                step=np.full(n_elements, step),
+                element=element,
+                voltage_pu_1=result.voltage_pu_1[step],
+                voltage_pu_2=result.voltage_pu_2[step],
+                reactive_power_1=result.reactive_power_1[step],
+                reactive_power_2=result.reactive_power_2[step],
+            )
+
+
+def export_exhaustive_sweep(result, exporter):
+    shape = result.low_voltage_difference.shape
+    n_halves, nr_serie = shape[:2]
+    block = shape[2:]
+    paralelo, n_failed = np.indices(block)
+
+    # Um bloco por lata (metade, posição em série) para limitar a memória de cada escrita
+    with exporter.table("exhaustive_sweep", n_rows=int(np.prod(shape)), metadata={"shape": list(shape)}) as table:
+        for half in range(n_halves):
+            for serie in range(nr_serie):
+                table.append(
+                    half=np.full(paralelo.size, half + 1),
+                    serie=np.full(paralelo.size, serie + 1),
+                    paralelo=paralelo + 1,
+                    n_failed=n_failed,
+                    low_voltage_difference=result.low_voltage_difference[half, serie],
+                    healthy_voltage_pu=result.healthy_voltage_pu[half, serie],
+                    failed_can_voltage_pu=result.failed_can_voltage_pu[half, serie],
+                )
+
+
+@profiled("export")
+def export_result(result, directory, file_format="parquet"):
+    # Exporta qualquer resultado de compute.run_analysis
+    from compute import ExhaustiveSweepResult
+
+    with ResultExporter(directory, file_format) as exporter:
+        if isinstance(result, ExhaustiveSweepResult):
+            export_exhaustive_sweep(result, exporter)
+        else:
+            export_sequential_sweep(result, exporter)
+    return exporter
+
+
+def load_table(directory, name, columns=None):
+    # Abre uma tabela exportada sem copiá-la para a memória: memmap para npy e Arrow IPC, leitura
+    # mapeada para Parquet. Retorna um dicionário coluna -> array (npy) ou uma pyarrow.Table.
+    with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as file:
+        manifest = json.load(file)
+    entry = manifest["tables"][name]
+    path = os.path.join(directory, entry["path"])
+    columns = columns or entry["columns"]
+
+    if manifest["format"] == "npy":
+        return {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r")[:entry["rows"]]
+                for column in columns}
+
+    pa = _import_pyarrow()
+    if manifest["format"] == "arrow":
+        table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        return table.select(columns)
+    return pa.parquet.read_table(path, columns=columns, memory_map=True)
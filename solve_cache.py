@@ -0,0 +1,189 @@
+import hashlib
+import json
+import numbers
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+from profiling import PROFILER
+
+
+# Incrementar sempre que o cálculo mudar, para invalidar resultados gravados em disco
+CACHE_VERSION = 5
+
+
+def normalize_inputs(inputs):
+    # 138 e 138.0 vindos da interface ou de arquivos devem gerar a mesma chave
+    normalized = {}
+    for key, value in sorted(inputs.items()):
+        if isinstance(value, bool) or value is None or isinstance(value, str):
+            normalized[key] = value
+        elif isinstance(value, numbers.Real):
+            normalized[key] = float(f"{float(value):.12g}")
+        else:
+            raise TypeError(f"Entrada '{key}' com tipo não suportado pelo cache: {type(value).__name__}")
+    return normalized
+
+
+def make_cache_key(inputs):
+    payload = json.dumps({"version": CACHE_VERSION, "inputs": normalize_inputs(inputs)}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SolveCache:
+    # Cache LRU de resultados limitado por número de entradas e por bytes, com camada opcional em disco.
+    # Compartilhado entre as sessões do servidor Streamlit, por isso protegido por lock. A camada em disco
+    # é limitada por max_disk_bytes (padrão: max_bytes), descartando os arquivos usados há mais tempo, e
+    # arquivos de outras versões do cálculo são apagados.
+    def __init__(self, max_entries=64, max_bytes=256 * 2 ** 20, disk_dir=None, max_disk_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_bytes if max_disk_bytes is None else max_disk_bytes
+        self.disk_dir = disk_dir
+        self.disk_evictions = 0
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._prune_disk()
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _disk_path(self, key):
+        # O prefixo de versão permite reconhecer e apagar resultados de versões anteriores
+        return os.path.join(self.disk_dir, f"v{CACHE_VERSION}_{key}.pkl")
+
+    def _prune_disk(self):
+        prefix = f"v{CACHE_VERSION}_"
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if not entry.name.endswith(".pkl"):
+                continue
+            # Outros processos podem apagar os mesmos arquivos ao mesmo tempo
+            try:
+                if not entry.name.startswith(prefix):
+                    os.unlink(entry.path)
+                    continue
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.disk_evictions += 1
+
+    def _store(self, key, value, size):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self.current_bytes += size
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_size
+            self.evictions += 1
+
+    def _read_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as file:
+                payload = file.read()
+            # A data de modificação marca o último uso, para o descarte dos mais antigos
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        try:
+            return pickle.loads(payload), len(payload)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Arquivo corrompido ou de uma versão incompatível: tratado como ausente
+            return None
+
+    def _write_disk(self, key, payload):
+        # Gravação atômica para que outro processo nunca leia um arquivo pela metade
+        descriptor, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(payload)
+            os.replace(temp_path, self._disk_path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self._prune_disk()
+
+    def get(self, inputs, default=None):
+        key = make_cache_key(inputs)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                PROFILER.count("cache_hits")
+                return self._entries[key][0]
+
+        from_disk = self._read_disk(key)
+        with self._lock:
+            if from_disk is None:
+                self.misses += 1
+                PROFILER.count("cache_misses")
+                return default
+            value, size = from_disk
+            self.disk_hits += 1
+            PROFILER.count("disk_cache_hits")
+            self._store(key, value, size)
+        return value
+
+    def put(self, inputs, value):
+        key = make_cache_key(inputs)
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._store(key, value, len(payload))
+        if self.disk_dir is not None:
+            self._write_disk(key, payload)
+
+    def get_or_compute(self, inputs, compute):
+        sentinel = object()
+        value = self.get(inputs, sentinel)
+        if value is sentinel:
+            value = compute(inputs)
+            self.put(inputs, value)
+        return value
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+        if disk and self.disk_dir is not None:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".pkl"):
+                    os.unlink(os.path.join(self.disk_dir, name))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+            }
@@ -0,0 +1,43 @@
+import numpy as np
+
+from impedance_analysis import ImpedanceAnalysis
+
+
+# Banco de referência dos testes e verificações contra ImpedanceAnalysis sobre matrizes de impedância
+# modificadas analiticamente (lata com k grupos em curto: Z * (nsi - k) / nsi).
+
+FREQUENCY = 60
+NR_SERIE_INTERNOS = 4
+NR_PARALELO_INTERNOS = 3
+V_PHASE = complex(69e3 / np.sqrt(3), 0)
+
+
+def capacitive_impedance(capacitance_uf):
+    return 1 / (1j * 2 * np.pi * FREQUENCY * np.asarray(capacitance_uf) * 1e-6)
+
+
+def unbalanced_bank():
+    # Metades desequilibradas e latas distintas, para que erros de eixo não se compensem
+    impedance_matrix_1 = capacitive_impedance([[10.0, 10.2], [9.9, 10.1], [10.05, 9.95]])
+    impedance_matrix_2 = capacitive_impedance([[10.1, 9.8], [10.0, 10.3], [9.85, 10.0]])
+    return impedance_matrix_1, capacitive_impedance(400.0), impedance_matrix_2, capacitive_impedance(410.0)
+
+
+def analyze(impedance_matrix_1, low_voltage_impedance_1, impedance_matrix_2, low_voltage_impedance_2,
+            v_phase=V_PHASE):
+    analysis = ImpedanceAnalysis(impedance_matrix_1, low_voltage_impedance_1,
+                                 impedance_matrix_2, low_voltage_impedance_2, v_phase)
+    analysis.perform_analysis()
+    return analysis
+
+
+def with_can(bank, half, serie, paralelo, impedance):
+    matrices = [np.array(bank[0]), np.array(bank[2])]
+    matrices[half][serie, paralelo] = impedance
+    return matrices[0], bank[1], matrices[1], bank[3]
+
+
+def assert_same_solution(solution, analysis):
+    for name in ("voltage_matrix_1", "voltage_matrix_2", "current_matrix_1", "current_matrix_2",
+                 "v_low_voltage_1", "v_low_voltage_2", "low_voltage_difference"):
+        np.testing.assert_allclose(getattr(solution, name), getattr(analysis, name), rtol=1e-9, err_msg=name)
@@ -0,0 +1,14 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório, sem pacote instalável
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bank_cases import unbalanced_bank  # noqa: E402
+
+
+@pytest.fixture
+def bank():
+    return unbalanced_bank()
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from impedance_analysis import (BatchImpedanceAnalysis, BatchImpedanceNetwork, ImpedanceNetwork,
+                                RESULT_ATTRIBUTES)
+from bank_cases import V_PHASE, analyze
+
+
+def stacked_cases(matrix, n_cases=5):
+    # Casos com latas escaladas de forma diferente, como estados de falha distintos
+    rng = np.random.default_rng(0)
+    return matrix[np.newaxis] * rng.uniform(0.7, 1.0, (n_cases,) + matrix.shape)
+
+
+def test_batch_network_matches_impedance_network(bank):
+    matrices = stacked_cases(bank[0])
+    solution = BatchImpedanceNetwork(matrices, bank[1], V_PHASE).solve()
+
+    for index, matrix in enumerate(matrices):
+        single = ImpedanceNetwork(matrix, bank[1], V_PHASE).solve()
+        for name, value in single._asdict().items():
+            np.testing.assert_allclose(getattr(solution, name)[index], value, rtol=1e-12, err_msg=name)
+
+
+@pytest.mark.parametrize("per_case", [False, True])
+def test_batch_analysis_matches_per_case_analysis(bank, per_case):
+    matrices_1, matrices_2 = stacked_cases(bank[0]), stacked_cases(bank[2])
+    n_cases = len(matrices_1)
+    if per_case:
+        # Impedância de baixa tensão e tensão de fase também podem variar por caso
+        low_voltage_impedances = (bank[1] * np.linspace(0.9, 1.1, n_cases), bank[3] * np.linspace(1.1, 0.9, n_cases))
+        v_phase = V_PHASE * np.exp(1j * np.linspace(0, 0.3, n_cases))
+        analysis = BatchImpedanceAnalysis(matrices_1, low_voltage_impedances[0], matrices_2, low_voltage_impedances[1],
+                                          v_phase)
+    else:
+        low_voltage_impedances = (np.full(n_cases, bank[1]), np.full(n_cases, bank[3]))
+        v_phase = np.full(n_cases, V_PHASE)
+        analysis = BatchImpedanceAnalysis(matrices_1, bank[1], matrices_2, bank[3], V_PHASE)
+    analysis.perform_analysis()
+
+    for index in range(n_cases):
+        single = analyze(matrices_1[index], low_voltage_impedances[0][index],
+                         matrices_2[index], low_voltage_impedances[1][index], v_phase[index])
+        extracted = analysis.case(index)
+        for name in RESULT_ATTRIBUTES:
+            np.testing.assert_allclose(getattr(analysis, name)[index], getattr(single, name),
+                                       rtol=1e-12, err_msg=name)
+            np.testing.assert_allclose(getattr(extracted, name), getattr(single, name), rtol=1e-12, err_msg=name)
+
+
+def test_batch_analysis_rejects_different_case_counts(bank):
+    with pytest.raises(ValueError):
+        BatchImpedanceAnalysis(stacked_cases(bank[0], 3), bank[1], stacked_cases(bank[2], 4), bank[3], V_PHASE)
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from batch_runner import run_batch, read_completed
+
+
+BANKS = [
+    ("A", {"nr_serie": 2}),
+    ("B", {"nr_serie": 3}),
+    ("C", {"nr_serie": 4}),
+]
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def ok_records(path):
+    # Registros com sucesso, em ordem de gravação
+    return [record["bank_id"] for record in read_records(path) if record["status"] == "ok"]
+
+
+@pytest.fixture
+def finished_output(tmp_path):
+    output = tmp_path / "resultados.jsonl"
+    run_batch(BANKS, str(output), max_workers=1, progress=False)
+    return output
+
+
+def test_resume_skips_completed_banks(finished_output):
+    assert run_batch(BANKS, str(finished_output), max_workers=1, progress=False) == 0
+    assert sorted(ok_records(finished_output)) == ["A", "B", "C"]
+
+
+def test_resume_rewrites_partial_last_line(finished_output):
+    content = finished_output.read_bytes()
+    last_line_start = content.rstrip(b"\n").rfind(b"\n") + 1
+    last_bank = json.loads(content[last_line_start:])["bank_id"]
+    # Interrupção no meio da gravação do último registro
+    finished_output.write_bytes(content[:last_line_start + 20])
+
+    assert run_batch(BANKS, str(finished_output), max_workers=1, progress=False) == 1
+    assert sorted(ok_records(finished_output)) == ["A", "B", "C"]
+    assert ok_records(finished_output)[-1] == last_bank
+
+
+def test_resume_rewrites_unterminated_complete_line(finished_output):
+    # Registro completo sem a quebra de linha final: é descartado e o banco é resolvido de novo
+    content = finished_output.read_bytes()
+    finished_output.write_bytes(content.rstrip(b"\n"))
+
+    assert run_batch(BANKS, str(finished_output), max_workers=1, progress=False) == 1
+    assert sorted(ok_records(finished_output)) == ["A", "B", "C"]
+
+
+def test_error_rows_are_retried(tmp_path):
+    output = tmp_path / "resultados.jsonl"
+    banks = BANKS + [("D", {"nr_serie": 0})]
+    run_batch(banks, str(output), max_workers=1, progress=False)
+    assert read_completed(str(output)) == {"A", "B", "C"}
+    assert [record["status"] for record in read_records(output) if record["bank_id"] == "D"] == ["error"]
+
+    # Com a entrada corrigida, somente o banco com erro é resolvido
+    banks[-1] = ("D", {"nr_serie": 2})
+    assert run_batch(banks, str(output), max_workers=1, progress=False) == 1
+    assert read_completed(str(output)) == {"A", "B", "C", "D"}
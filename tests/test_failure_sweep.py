@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from failure_sweep import ElementFailureSweep
+from bank_cases import NR_SERIE_INTERNOS, V_PHASE, analyze, with_can
+
+
+def test_element_failure_sweep_matches_per_state_analysis(bank):
+    result = ElementFailureSweep(*bank, V_PHASE, NR_SERIE_INTERNOS).run()
+    nr_serie, nr_paralelo = bank[0].shape
+
+    for half in range(2):
+        for serie in range(nr_serie):
+            for paralelo in range(nr_paralelo):
+                for n_failed in range(NR_SERIE_INTERNOS + 1):
+                    impedance = bank[2 * half][serie, paralelo] * (NR_SERIE_INTERNOS - n_failed) / NR_SERIE_INTERNOS
+                    analysis = analyze(*with_can(bank, half, serie, paralelo, impedance))
+                    voltage_matrix = np.abs((analysis.voltage_matrix_1, analysis.voltage_matrix_2)[half])
+                    state = half, serie, paralelo, n_failed
+
+                    np.testing.assert_allclose(result.low_voltage_difference[state],
+                                               analysis.low_voltage_difference, rtol=1e-9)
+                    np.testing.assert_allclose(result.v_low_voltage[state],
+                                               (analysis.v_low_voltage_1, analysis.v_low_voltage_2)[half],
+                                               rtol=1e-9)
+                    np.testing.assert_allclose(result.failed_can_voltage[state],
+                                               voltage_matrix[serie, paralelo], rtol=1e-9, atol=1e-9)
+                    # Latas sãs da mesma cadeia: a de maior tensão
+                    others = np.delete(voltage_matrix[:, paralelo], serie)
+                    np.testing.assert_allclose(result.healthy_voltage[state], others.max(), rtol=1e-9)
+
+
+def test_single_can_strings_are_rejected(bank):
+    # Sem lata sã na cadeia não há tensão de referência; o curto total daria divisão por zero
+    with pytest.raises(ValueError):
+        ElementFailureSweep(bank[0][:1], bank[1], bank[2][:1], bank[3], V_PHASE, NR_SERIE_INTERNOS)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from impedance_analysis import BatchImpedanceNetwork
+from harmonic_sweep import HarmonicSweep
+from protection_settings import ProtectionSettingSolver
+from bank_cases import FREQUENCY, V_PHASE
+
+
+# Capacitâncias em F das duas metades desequilibradas e dos capacitores de baixa tensão
+CAPACITANCE_MATRIX_1 = np.array([[10.0, 10.2], [9.9, 10.1], [10.05, 9.95]]) * 1e-6
+CAPACITANCE_MATRIX_2 = np.array([[10.1, 9.8], [10.0, 10.3], [9.85, 10.0]]) * 1e-6
+CAPACITANCE_LOW_VOLTAGE = (400e-6, 410e-6)
+
+
+@pytest.mark.parametrize("order, magnitude", [(1, 1.0), (5, 0.04), (7.5, 0.02 + 0.01j)])
+def test_single_frequency_matches_batch_network(order, magnitude):
+    sweep = HarmonicSweep(CAPACITANCE_MATRIX_1, CAPACITANCE_LOW_VOLTAGE[0],
+                          CAPACITANCE_MATRIX_2, CAPACITANCE_LOW_VOLTAGE[1], FREQUENCY, V_PHASE)
+    result = sweep.run([order], [magnitude])
+
+    omega = 2 * np.pi * FREQUENCY * order
+    solutions = [
+        BatchImpedanceNetwork(1 / (1j * omega * capacitance_matrix[np.newaxis]),
+                              1 / (1j * omega * capacitance_low_voltage), V_PHASE * magnitude).solve()
+        for capacitance_matrix, capacitance_low_voltage in zip((CAPACITANCE_MATRIX_1, CAPACITANCE_MATRIX_2),
+                                                               CAPACITANCE_LOW_VOLTAGE)
+    ]
+
+    np.testing.assert_allclose(result.frequencies, [FREQUENCY * order])
+    np.testing.assert_allclose(result.low_voltage_difference,
+                               np.abs(solutions[1].v_low_voltage - solutions[0].v_low_voltage), rtol=1e-9)
+    for half, solution in enumerate(solutions):
+        np.testing.assert_allclose(result.can_voltage[half], np.abs(solution.voltage_matrix), rtol=1e-9)
+        np.testing.assert_allclose(result.can_current[half], np.abs(solution.current_matrix), rtol=1e-9)
+        np.testing.assert_allclose(result.reactive_power[half], solution.reactive_power_matrix, rtol=1e-9)
+
+
+def test_healthy_bank_has_no_differential_voltage():
+    result = HarmonicSweep.from_inputs({}).run()
+    np.testing.assert_allclose(result.low_voltage_difference, 0, atol=1e-9)
+
+
+@pytest.mark.parametrize("location", [(0, 0), (1, 1)])
+@pytest.mark.parametrize("failed_groups", [1, 6, 12])
+def test_failure_state_matches_setting_solver_at_fundamental(location, failed_groups):
+    inputs = {"nr_serie": 4, "nr_paralelo": 2}
+    result = HarmonicSweep.from_inputs(inputs, failed_groups=failed_groups, location=location).run([1], [1.0])
+    solver = ProtectionSettingSolver.from_inputs(inputs)
+
+    pt, _ = solver.evaluate(location, failed_groups)
+    assert result.low_voltage_difference[0] == pytest.approx(pt, rel=1e-9)
+
+
+def test_failure_state_outside_chain_is_rejected():
+    with pytest.raises(ValueError):
+        HarmonicSweep.from_inputs({"nr_serie": 4}, failed_groups=13)
+    with pytest.raises(ValueError):
+        HarmonicSweep.from_inputs({"nr_paralelo": 2}, failed_groups=1, location=(0, 2))
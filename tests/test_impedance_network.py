@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from impedance_analysis import ImpedanceNetwork
+from bank_cases import V_PHASE
+
+
+def expected_total_impedance(impedance_matrix, low_voltage_impedance):
+    return 1 / np.sum(1 / np.sum(impedance_matrix, axis=0)) + low_voltage_impedance
+
+
+@pytest.fixture
+def network(bank):
+    return ImpedanceNetwork(bank[0], bank[1], V_PHASE)
+
+
+def test_solution_is_computed_once(network):
+    solution = network.solve()
+    assert network.solve() is solution
+    voltage_matrix, _ = network.calculate_voltage_matrix()
+    assert voltage_matrix is solution.voltage_matrix
+    with pytest.raises(ValueError):
+        solution.voltage_matrix[0, 0] = 0
+
+
+@pytest.mark.parametrize("attribute, scale", [("impedance_matrix", 0.8), ("low_voltage_impedance", 1.5),
+                                              ("v_phase", 1.1)])
+def test_assigning_an_input_invalidates_the_solution(network, bank, attribute, scale):
+    inputs = {"impedance_matrix": bank[0], "low_voltage_impedance": bank[1], "v_phase": V_PHASE}
+    network.solve()
+    network.total_impedance
+    inputs[attribute] = inputs[attribute] * scale
+    setattr(network, attribute, inputs[attribute])
+
+    total_impedance = expected_total_impedance(inputs["impedance_matrix"], inputs["low_voltage_impedance"])
+    np.testing.assert_allclose(network.total_impedance, total_impedance, rtol=1e-12)
+    np.testing.assert_allclose(network.calculate_total_current(), inputs["v_phase"] / total_impedance, rtol=1e-12)
+
+
+def test_changing_the_original_array_does_not_stale_the_solution(bank):
+    matrix = np.array(bank[0])
+    network = ImpedanceNetwork(matrix, bank[1], V_PHASE)
+    total_current = network.calculate_total_current()
+    matrix *= 0.5
+
+    assert network.calculate_total_current() == total_current
+    with pytest.raises(ValueError):
+        network.impedance_matrix[0, 0] = 0
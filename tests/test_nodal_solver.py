@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from nodal_solver import NodalBankSolver
+from bank_cases import NR_SERIE_INTERNOS, NR_PARALELO_INTERNOS, V_PHASE, analyze, with_can, assert_same_solution
+
+
+def nodal_solver(bank):
+    return NodalBankSolver(*bank, V_PHASE, NR_SERIE_INTERNOS, NR_PARALELO_INTERNOS)
+
+
+def test_nodal_healthy_bank_matches_analysis(bank):
+    assert_same_solution(nodal_solver(bank).solve(), analyze(*bank))
+
+
+@pytest.mark.parametrize("half, serie, paralelo", [(0, 0, 0), (1, 2, 1), (0, 1, 1)])
+@pytest.mark.parametrize("n_shorted", [1, 2, NR_SERIE_INTERNOS - 1])
+def test_nodal_shorted_groups_match_analytic_can(bank, half, serie, paralelo, n_shorted):
+    solver = nodal_solver(bank)
+    shorts = [(half, serie, paralelo, group) for group in range(n_shorted)]
+    impedance = bank[2 * half][serie, paralelo] * (NR_SERIE_INTERNOS - n_shorted) / NR_SERIE_INTERNOS
+
+    assert_same_solution(solver.solve(shorts=shorts), analyze(*with_can(bank, half, serie, paralelo, impedance)))
+
+
+@pytest.mark.parametrize("half, serie, paralelo", [(0, 2, 0), (1, 0, 1)])
+@pytest.mark.parametrize("n_open", [1, NR_PARALELO_INTERNOS - 1])
+def test_nodal_open_elements_match_analytic_can(bank, half, serie, paralelo, n_open):
+    solver = nodal_solver(bank)
+    # Grupo com n elementos abertos: (Z / nsi) * npi / (npi - n) em série com os demais grupos sãos
+    group_impedance = bank[2 * half][serie, paralelo] / NR_SERIE_INTERNOS
+    impedance = (group_impedance * (NR_SERIE_INTERNOS - 1)
+                 + group_impedance * NR_PARALELO_INTERNOS / (NR_PARALELO_INTERNOS - n_open))
+    solution = solver.solve(opens={(half, serie, paralelo, 1): n_open})
+
+    assert_same_solution(solution, analyze(*with_can(bank, half, serie, paralelo, impedance)))
+
+
+def test_nodal_fully_open_group_removes_chain(bank):
+    solver = nodal_solver(bank)
+    solution = solver.solve(opens={(1, 1, 0, 2): NR_PARALELO_INTERNOS})
+    # Sem a cadeia 0 da metade 2, o banco equivale ao da metade 2 com uma única cadeia
+    analysis = analyze(bank[0], bank[1], bank[2][:, 1:], bank[3])
+
+    np.testing.assert_allclose(solution.low_voltage_difference, analysis.low_voltage_difference, rtol=1e-9)
+    np.testing.assert_allclose(solution.current_matrix_2[:, 1:], analysis.current_matrix_2, rtol=1e-9)
+    np.testing.assert_allclose(solution.current_matrix_2[:, 0], 0, atol=1e-9)
+    np.testing.assert_allclose(solution.voltage_matrix_1, analysis.voltage_matrix_1, rtol=1e-9)
+
+
+def test_nodal_short_prevails_over_open(bank):
+    solver = nodal_solver(bank)
+    key = (0, 1, 0, 0)
+    shorted = solver.solve(shorts=[key])
+    both = solver.solve(shorts=[key], opens={key: 1})
+
+    np.testing.assert_allclose(both.low_voltage_difference, shorted.low_voltage_difference, rtol=1e-12)
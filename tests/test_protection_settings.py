@@ -0,0 +1,57 @@
+import pytest
+
+from protection_settings import ProtectionSettingSolver, NOT_FOUND
+
+
+def linear_first_failure_count(solver, location, condition):
+    for n_failed in range(1, solver.max_failures + 1):
+        if condition(*solver.evaluate(location, n_failed)):
+            return n_failed
+    return NOT_FOUND
+
+
+@pytest.mark.parametrize("nr_serie", [2, 4])
+@pytest.mark.parametrize("fraction", [0.0, 0.1, 0.35, 0.6, 0.95, 1.5])
+def test_bisection_matches_linear_scan(nr_serie, fraction):
+    solver = ProtectionSettingSolver.from_inputs({"nr_serie": nr_serie, "nr_paralelo": 2})
+    # Limiares entre o estado são e o de máximo de falhas, para que o critério caia no meio da cadeia
+    healthy_pt, healthy_overvoltage = solver.evaluate(solver.locations[0], 0)
+    worst_pt, worst_overvoltage = solver.evaluate(solver.locations[0], solver.max_failures)
+    pt_limit = healthy_pt + fraction * (worst_pt - healthy_pt)
+    overvoltage_limit = healthy_overvoltage + fraction * (worst_overvoltage - healthy_overvoltage)
+    conditions = [
+        lambda pt, overvoltage: overvoltage > overvoltage_limit,
+        lambda pt, overvoltage: pt >= pt_limit,
+    ]
+
+    for condition in conditions:
+        for location in solver.locations:
+            assert (solver.first_failure_count(location, condition)
+                    == linear_first_failure_count(solver, location, condition))
+
+
+def test_settings_operating_counts_match_linear_scan():
+    solver = ProtectionSettingSolver.from_inputs({"nr_serie": 4, "nr_paralelo": 2},
+                                                 alarm_limit=3.0, trip_limit=4.0, sensitivity_margin=0.2)
+    settings = solver.run()
+
+    for location in solver.locations:
+        assert settings.trip_failures[location] == linear_first_failure_count(
+            solver, location, lambda pt, overvoltage: overvoltage > solver.trip_limit)
+        assert settings.min_detectable_failures[location] == linear_first_failure_count(
+            solver, location, lambda pt, overvoltage: pt >= settings.alarm_setting)
+        assert settings.trip_operating_failures[location] == linear_first_failure_count(
+            solver, location, lambda pt, overvoltage: pt >= settings.trip_setting)
+
+
+def test_security_floor_applies_to_trip_without_critical_alarm():
+    # Alarme inalcançável (sinal crítico nan): o trip ainda deve ficar acima do desequilíbrio natural
+    solver = ProtectionSettingSolver.from_inputs({}, alarm_limit=1000, trip_limit=1.1, inherent_unbalance=60)
+    settings = solver.run()
+    security_floor = settings.natural_unbalance / (1 - solver.sensitivity_margin)
+
+    assert (settings.alarm_failures == NOT_FOUND).all()
+    assert settings.alarm_setting == pytest.approx(security_floor)
+    assert settings.trip_setting >= security_floor
+    # O piso supera o sinal no estado crítico de trip: o local não é atendido
+    assert not settings.trip_sensitivity_met.any()
@@ -0,0 +1,87 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from compute import run_analysis
+from result_export import EXPORT_FORMATS, MANIFEST_NAME, ResultExporter, export_analysis, export_result, load_table
+from bank_cases import FREQUENCY, analyze
+
+
+def column(table, name):
+    # load_table devolve um dicionário de memmaps (npy) ou uma pyarrow.Table
+    if isinstance(table, dict):
+        return np.asarray(table[name])
+    return table.column(name).to_numpy()
+
+
+@pytest.fixture(params=EXPORT_FORMATS)
+def file_format(request):
+    if request.param != "npy":
+        pytest.importorskip("pyarrow")
+    return request.param
+
+
+def test_sequential_sweep_round_trip(tmp_path, file_format):
+    result = run_analysis({"nr_serie": 4, "nr_paralelo": 2})
+    export_result(result, str(tmp_path), file_format)
+
+    steps = load_table(str(tmp_path), "sweep_steps")
+    np.testing.assert_array_equal(column(steps, "potential_transformer_ddp"), result.potential_transformer_ddp)
+    np.testing.assert_array_equal(column(steps, "voltage_healthy_capacitors"), result.voltage_healthy_capacitors)
+    elements = load_table(str(tmp_path), "sweep_elements", columns=["voltage_pu_1"])
+    np.testing.assert_array_equal(column(elements, "voltage_pu_1").reshape(result.voltage_pu_1.shape),
+                                  result.voltage_pu_1)
+
+
+def test_exhaustive_sweep_round_trip(tmp_path, file_format):
+    result = run_analysis({"nr_serie": 3, "nr_paralelo": 2, "modo_varredura": "Exaustivo"})
+    export_result(result, str(tmp_path), file_format)
+
+    table = load_table(str(tmp_path), "exhaustive_sweep")
+    shape = result.low_voltage_difference.shape
+    for name in ("low_voltage_difference", "healthy_voltage_pu", "failed_can_voltage_pu"):
+        np.testing.assert_array_equal(column(table, name).reshape(shape), getattr(result, name), err_msg=name)
+    # Índices a partir de 1 na mesma ordem dos eixos (metade, lata, cadeia, grupos em curto)
+    np.testing.assert_array_equal(column(table, "half").reshape(shape)[:, 0, 0, 0], [1, 2])
+    np.testing.assert_array_equal(column(table, "n_failed").reshape(shape)[0, 0, 0], np.arange(shape[-1]))
+
+
+def test_analysis_round_trip(tmp_path, file_format, bank):
+    analysis = analyze(*bank)
+    with ResultExporter(str(tmp_path), file_format) as exporter:
+        export_analysis(analysis, exporter, FREQUENCY)
+
+    network = load_table(str(tmp_path), "network")
+    voltages = column(network, "voltage").reshape((2,) + bank[0].shape)
+    np.testing.assert_allclose(voltages, np.abs([analysis.voltage_matrix_1, analysis.voltage_matrix_2]))
+    np.testing.assert_allclose(column(network, "capacitance")[:bank[0].size],
+                               analysis.network_1.calculate_capacitance_matrix(FREQUENCY).ravel())
+    low_voltage = load_table(str(tmp_path), "low_voltage")
+    np.testing.assert_allclose(column(low_voltage, "low_voltage_difference"), analysis.low_voltage_difference)
+
+
+def test_failed_export_leaves_no_manifest(tmp_path):
+    export_result(run_analysis({"nr_serie": 4}), str(tmp_path), "npy")
+    assert os.path.exists(tmp_path / MANIFEST_NAME)
+
+    with pytest.raises(RuntimeError):
+        with ResultExporter(str(tmp_path), "npy") as exporter:
+            with exporter.table("sweep_steps", n_rows=2) as table:
+                table.append(value=np.zeros(2))
+            raise RuntimeError("interrompida")
+    assert not os.path.exists(tmp_path / MANIFEST_NAME)
+
+
+def test_incomplete_table_is_left_out_of_the_manifest(tmp_path):
+    with ResultExporter(str(tmp_path), "npy") as exporter:
+        with exporter.table("complete", n_rows=2) as table:
+            table.append(value=np.zeros(2))
+        with pytest.raises(ValueError):
+            with exporter.table("partial", n_rows=4) as table:
+                table.append(value=np.zeros(2))
+                table.append(other=np.zeros(2))
+
+    with open(tmp_path / MANIFEST_NAME, encoding="utf-8") as file:
+        assert list(json.load(file)["tables"]) == ["complete"]
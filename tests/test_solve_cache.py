@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pytest
+
+from solve_cache import SolveCache, make_cache_key, CACHE_VERSION
+from compute import run_analysis
+
+
+class CountingCompute:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, inputs):
+        self.calls += 1
+        return run_analysis(inputs)
+
+
+def test_equivalent_inputs_share_a_key():
+    assert make_cache_key({"tensao_kv": 138, "nr_serie": 12}) == make_cache_key({"nr_serie": 12.0, "tensao_kv": 138.0})
+    assert make_cache_key({"tensao_kv": 138}) != make_cache_key({"tensao_kv": 69})
+
+
+def test_hit_returns_the_computed_result_without_recomputing():
+    cache = SolveCache()
+    compute = CountingCompute()
+    first = cache.get_or_compute({"nr_serie": 4}, compute)
+    second = cache.get_or_compute({"nr_serie": 4.0}, compute)
+
+    assert compute.calls == 1
+    assert second is first
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SolveCache(max_entries=2)
+    for nr_serie in (2, 3):
+        cache.put({"nr_serie": nr_serie}, nr_serie)
+    cache.get({"nr_serie": 2})
+    cache.put({"nr_serie": 4}, 4)
+
+    assert cache.get({"nr_serie": 3}) is None
+    assert cache.get({"nr_serie": 2}) == 2 and cache.get({"nr_serie": 4}) == 4
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_larger_than_the_budget_are_not_kept():
+    cache = SolveCache(max_bytes=1000)
+    cache.put({"nr_serie": 2}, np.zeros(1000))
+    assert len(cache) == 0 and cache.stats()["bytes"] == 0
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    compute = CountingCompute()
+    first = SolveCache(disk_dir=str(tmp_path)).get_or_compute({"nr_serie": 4}, compute)
+    restarted = SolveCache(disk_dir=str(tmp_path))
+    second = restarted.get_or_compute({"nr_serie": 4}, compute)
+
+    assert compute.calls == 1
+    assert restarted.stats()["disk_hits"] == 1
+    np.testing.assert_array_equal(second.potential_transformer_ddp, first.potential_transformer_ddp)
+
+
+def test_other_versions_are_deleted_and_disk_tier_is_bounded(tmp_path):
+    stale = [tmp_path / f"v{CACHE_VERSION - 1}_abc.pkl", tmp_path / "abc.pkl"]
+    for path in stale:
+        path.write_bytes(b"x")
+    cache = SolveCache(disk_dir=str(tmp_path), max_disk_bytes=2500)
+    assert not any(path.exists() for path in stale)
+
+    for index in range(5):
+        cache.put({"nr_serie": index + 2}, np.zeros(200))
+        # Datas de modificação distintas para uma ordem de descarte determinística
+        for entry in os.scandir(tmp_path):
+            os.utime(entry.path, (entry.stat().st_mtime - 1, entry.stat().st_mtime - 1))
+    sizes = [entry.stat().st_size for entry in os.scandir(tmp_path)]
+
+    assert sum(sizes) <= 2500
+    assert cache.stats()["disk_evictions"] == 5 - len(sizes)
+    # Os mais recentes permanecem em disco
+    assert SolveCache(disk_dir=str(tmp_path), max_disk_bytes=2500).get({"nr_serie": 6}) is not None
+
+
+@pytest.mark.parametrize("value", [[1.0], {"a": 1}])
+def test_unsupported_input_types_are_rejected(value):
+    with pytest.raises(TypeError):
+        make_cache_key({"tensao_kv": value})
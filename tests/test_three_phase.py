@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from impedance_analysis import ThreePhaseImpedanceAnalysis, phase_voltages, RESULT_ATTRIBUTES
+from bank_cases import V_PHASE, analyze
+
+
+# Estados (n_states, 3, nr_serie, nr_paralelo): fases com latas diferentes para que erros de eixo apareçam
+def three_phase_matrices(matrix):
+    phase_scale = np.array([1.0, 1.01, 0.985])[:, np.newaxis, np.newaxis]
+    state_scale = np.array([1.0, 0.97])[:, np.newaxis, np.newaxis, np.newaxis]
+    return matrix * phase_scale * state_scale
+
+
+@pytest.fixture
+def three_phase_bank(bank):
+    return three_phase_matrices(bank[0]), bank[1], three_phase_matrices(bank[2]), bank[3]
+
+
+def test_grounded_neutral_matches_single_phase_per_phase(three_phase_bank):
+    voltages = phase_voltages(V_PHASE, negative_sequence=0.02)
+    analysis = ThreePhaseImpedanceAnalysis(*three_phase_bank, voltages, neutral_impedance=0)
+    analysis.perform_analysis()
+    matrices_1, low_voltage_impedance_1, matrices_2, low_voltage_impedance_2 = three_phase_bank
+
+    np.testing.assert_allclose(analysis.neutral_voltage, 0)
+    for state in range(analysis.shape[0]):
+        for phase in range(3):
+            single_phase = analyze(matrices_1[state, phase], low_voltage_impedance_1,
+                                   matrices_2[state, phase], low_voltage_impedance_2, voltages[phase])
+            for name in RESULT_ATTRIBUTES:
+                np.testing.assert_allclose(getattr(analysis, name)[state, phase], getattr(single_phase, name),
+                                           rtol=1e-9, err_msg=name)
+
+
+@pytest.mark.parametrize("neutral_impedance", [-50j, np.inf])
+def test_neutral_shift_does_not_modify_networks(three_phase_bank, neutral_impedance):
+    analysis = ThreePhaseImpedanceAnalysis(*three_phase_bank, phase_voltages(V_PHASE, negative_sequence=0.05),
+                                           neutral_impedance=neutral_impedance)
+    v_phase = [network.v_phase.copy() for network in analysis.networks]
+    analysis.perform_analysis()
+    first = {name: getattr(analysis, name) for name in RESULT_ATTRIBUTES}
+    analysis.perform_analysis()
+
+    for network, original in zip(analysis.networks, v_phase):
+        np.testing.assert_array_equal(network.v_phase, original)
+    for name, value in first.items():
+        np.testing.assert_allclose(getattr(analysis, name), value, rtol=1e-12, err_msg=name)
+    # Corrente no neutro: V_n / Z_n (nula com o neutro isolado)
+    np.testing.assert_allclose(analysis.neutral_current, analysis.neutral_voltage / neutral_impedance,
+                               atol=1e-9 * np.abs(analysis.i_low_voltage_1).max())
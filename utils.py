@@ -1,9 +1,17 @@
+import json
+import os
+import tempfile
+import time
+import uuid
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-from impedance_analysis import ImpedanceAnalysis
+from compute import run_analysis, ExhaustiveSweepResult, SWEEP_MODES
+from failure_sweep import SWEEP_AXES
+from profiling import PROFILER, profiled
 
 
+@profiled("configure_inputs")
 def configure_inputs():
     st.sidebar.header("Parâmetros de Entrada")
 
@@ -16,6 +24,7 @@ def configure_inputs():
                                                            format="%.2f")
     nr_serie_internos = st.sidebar.number_input("Número de SubCapacitores em Série", value=4, step=1, format="%d")
     nr_paralelo_internos = st.sidebar.number_input("Número de SubCapacitores em Paralelo", value=9, step=1, format="%d")
+    modo_varredura = st.sidebar.selectbox("Modo de Varredura", SWEEP_MODES)
 
     # Retornar entradas como dicionário
     return {
@@ -27,155 +36,109 @@ def configure_inputs():
         "capacitancia_baixa_tensao_uf": capacitancia_baixa_tensao_uf,
         "nr_serie_internos": nr_serie_internos,
         "nr_paralelo_internos": nr_paralelo_internos,
-        "tensao_lata": 7967.4
+        "tensao_lata": 7967.4,
+        "modo_varredura": modo_varredura
     }
 
 
-def execute_analysis(inputs):
+def execute_analysis(inputs, cache=None):
     st.info("Executando análise...")
 
-    # Processar entradas
-    frequencia = inputs["frequencia"]
-    tensao = inputs["tensao_kv"] * 1e3  # Convertendo kV para V
-    capacitancia_padrao = inputs["capacitancia_padrao_uf"] * 1e-6  # Convertendo µF para F
-    capacitancia_baixa_tensao = inputs["capacitancia_baixa_tensao_uf"] * 1e-6  # Convertendo µF para F
-    nr_serie = inputs["nr_serie"]
-    nr_paralelo = inputs["nr_paralelo"]
-    nr_serie_internos = inputs["nr_serie_internos"]
-    nr_paralelo_internos = inputs["nr_paralelo_internos"]
-    tensao_lata = inputs["tensao_lata"]
-    capacitancia_internos = capacitancia_padrao / nr_paralelo_internos * nr_serie_internos
-
-    # Calcular impedâncias
-    impedancia_padrao = 1 / (1j * 2 * np.pi * frequencia * capacitancia_padrao)
-    impedancia_bt = 1 / (1j * 2 * np.pi * frequencia * capacitancia_baixa_tensao)
-    impedancia_internos = 1 / (1j * 2 * np.pi * frequencia * capacitancia_internos)
-    v_phase = complex(tensao / np.sqrt(3), 0)
-
-    # Matrizes de impedância
-    impedance_matrix = impedancia_padrao * np.ones((nr_serie, nr_paralelo), dtype=complex)
-    impedance_matrix_internos = impedancia_internos * np.ones((nr_serie_internos, nr_paralelo_internos), dtype=complex)
-    impedance_matrix_internos2 = impedancia_internos * np.ones((nr_serie_internos, nr_paralelo_internos), dtype=complex)
-    impedance_matrix_internos3 = impedancia_internos * np.ones((nr_serie_internos, nr_paralelo_internos), dtype=complex)
-
-    df1_voltage_list = []
-    df2_voltagedf_list = []
-    df1_reactive_power_list = []
-    df2_reactive_power_list = []
-    v_low_voltage_1_list = []
-    v_low_voltage_2_list = []
-    i_low_voltage_1_list = []
-    i_low_voltage_2_list = []
-    low_voltage_reactive_power_1_list = []
-    low_voltage_reactive_power_2_list = []
-    potential_transformer_ddp_list = []
-    impedance_matrix_1 = impedance_matrix.copy()
-    impedance_matrix_2 = impedance_matrix.copy()
-    for ii in range(0, 3*nr_serie_internos+1, 1):
-        if ii <= nr_serie_internos:
-            impedance_matrix_internos[0:ii, :] = 1e-99
-            impedance_paralelos_internos = 1 / np.sum(1 / impedance_matrix_internos, axis=1)
-            impedance_00 = np.sum(impedance_paralelos_internos)
-            impedance_matrix_1[0, 0] = impedance_00
-        elif ii <= 2*nr_serie_internos:
-            jj = ii - nr_serie_internos
-            impedance_matrix_internos2[0:jj, :] = 1e-99
-            impedance_paralelos_internos2 = 1 / np.sum(1 / impedance_matrix_internos2, axis=1)
-            impedance_10 = np.sum(impedance_paralelos_internos2)
-            impedance_matrix_1[1, 0] = impedance_10
-        elif ii <= 3*nr_serie_internos:
-            kk = ii - 2*nr_serie_internos
-            impedance_matrix_internos3[0:kk, :] = 1e-99
-            impedance_paralelos_internos3 = 1 / np.sum(1 / impedance_matrix_internos3, axis=1)
-            impedance_20 = np.sum(impedance_paralelos_internos3)
-            impedance_matrix_1[2, 0] = impedance_20
-
-        analysis = ImpedanceAnalysis(
-            impedance_matrix_1,
-            impedancia_bt,
-            impedance_matrix_2,
-            impedancia_bt,
-            v_phase
-        )
-        analysis.perform_analysis()
-
-        voltage_matrix_1, v_low_voltage_1 = analysis.network_1.calculate_voltage_matrix()
-        voltage_matrix_2, v_low_voltage_2 = analysis.network_2.calculate_voltage_matrix()
-        reactive_power_matrix_1 = analysis.network_1.calculate_reactive_power_matrix()
-        reactive_power_matrix_2 = analysis.network_2.calculate_reactive_power_matrix()
-
-        df1_voltage = pd.DataFrame({
-            f"V (pu) {ii}": np.abs(voltage_matrix_1).flatten() / tensao_lata,
-            # f"Potências Reativas (kVAr) {ii}": reactive_power_matrix_1.flatten() / tensao_lata
-        })
-        df1_reactive_power = pd.DataFrame({
-            f"Potências Reativas (kVAr) {ii}": reactive_power_matrix_1.flatten()
-        })
-        df1_voltage_list.append(df1_voltage)
-        df1_reactive_power_list.append(df1_reactive_power)
-
-        df2_voltagedf = pd.DataFrame({
-            f"Tensões (kV) {ii}": np.abs(voltage_matrix_2).flatten() / tensao_lata,
-        })
-        df2_reactive_power = pd.DataFrame({
-            f"Potências Reativas (kVAr) {ii}": reactive_power_matrix_2.flatten()
-        })
-        df2_voltagedf_list.append(df2_voltagedf)
-        df2_reactive_power_list.append(df1_reactive_power)
-
-        v_low_voltage_1_list.append(np.abs(v_low_voltage_1))
-        v_low_voltage_2_list.append(np.abs(v_low_voltage_2))
-        i_low_voltage_1_list.append(np.abs(analysis.i_low_voltage_1))
-        i_low_voltage_2_list.append(np.abs(analysis.i_low_voltage_2))
-        low_voltage_reactive_power_1_list.append(analysis.low_voltage_reactive_power_1)
-        low_voltage_reactive_power_2_list.append(analysis.low_voltage_reactive_power_2)
-        potential_transformer_ddp_list.append(np.abs(v_low_voltage_1 - v_low_voltage_2))
-
-    df_combined = pd.DataFrame()
-    df_last_rows = pd.DataFrame()
-
-
-    for ii, df in enumerate(df1_voltage_list):
-        df_combined = pd.concat([df_combined, df], axis=1)
-        first_row = df.iloc[0:]
-        second_row = df.iloc[1:]
-        last_row = df.iloc[-1:]
-        df_last_rows = pd.concat([df_last_rows, last_row], axis=1)
-
-    # Criar o DataFrame final diretamente
-    df_final = pd.DataFrame(
-        {
-            f"{ii}": [potential_transformer_ddp_list[ii], df_last_rows.iloc[0, ii]]
-            for ii in range(len(potential_transformer_ddp_list))
-        },
-        index=["Potential Transformer DDP", "Voltage Healty Capacitors"]
-    )
+    with PROFILER.span("execute_analysis"):
+        # Um acerto no cache devolve os resultados já calculados, sem refazer a varredura
+        if cache is not None:
+            results = cache.get_or_compute(inputs, run_analysis)
+        else:
+            results = run_analysis(inputs)
+
+        display_results(results)
+
+
+def display_results(results):
+    if isinstance(results, ExhaustiveSweepResult):
+        display_exhaustive_sweep(results)
+        return
+
+    # DataFrame montado somente para exibição
+    with PROFILER.span("dataframe_assembly"):
+        df_final = results.summary_frame()
 
     # Exibir o DataFrame final
     st.markdown("## DDP and voltage at healthy capacitors as a function of blown fuses" )
     st.write("DataFrame Final:", df_final.T)
 
-    soma_reativos_list = []
-
-    # Iterar sobre todas as posições das listas de reativos
-    for idx in range(len(low_voltage_reactive_power_1_list)):
-        soma_reativos = (
-                low_voltage_reactive_power_1_list[idx] +
-                low_voltage_reactive_power_2_list[idx] +
-                df1_reactive_power_list[idx].values.sum() +
-                df2_reactive_power_list[idx].values.sum() +
-                2 * low_voltage_reactive_power_1_list[0] +
-                2 * low_voltage_reactive_power_2_list[0] +
-                2 * df1_reactive_power_list[0].values.sum() +
-                2 * df2_reactive_power_list[0].values.sum()
-        )
-        soma_reativos_list.append(soma_reativos)
-
     st.markdown("## Low voltage capacitors work quantities:")
-    st.write(f"Voltage  = {round(v_low_voltage_1_list[0], 2)} V")
-    st.write(f"Current  = {round(i_low_voltage_1_list[0], 2)} A")
-    st.write(f"Power    = {round(low_voltage_reactive_power_1_list[0] / 1e3, 2)} kVAr")
+    st.write(f"Voltage  = {round(results.v_low_voltage, 2)} V")
+    st.write(f"Current  = {round(results.i_low_voltage, 2)} A")
+    st.write(f"Power    = {round(results.low_voltage_reactive_power / 1e3, 2)} kVAr")
 
     st.markdown("## Power as function of blown fuses")
-    st.write(soma_reativos_list)
+    st.write(results.total_reactive_power.tolist())
 
+
+def display_exhaustive_sweep(results):
+    # Metades, latas e cadeias numeradas a partir de 1; grupos em curto a partir de 0
+    n_halves, n_serie, n_paralelo, n_failed = results.low_voltage_difference.shape
+    with PROFILER.span("dataframe_assembly"):
+        index = pd.MultiIndex.from_product(
+            [range(1, n_halves + 1), range(1, n_serie + 1), range(1, n_paralelo + 1), range(n_failed)],
+            names=SWEEP_AXES,
+        )
+        df_sweep = pd.DataFrame({
+            "Potential Transformer DDP": results.low_voltage_difference.ravel(),
+            "Voltage Healty Capacitors (pu)": results.healthy_voltage_pu.ravel(),
+            "Voltage Failed Capacitor (pu)": results.failed_can_voltage_pu.ravel(),
+        }, index=index)
+
+    st.markdown("## Exhaustive sweep: worst case over every can, string and half")
+    st.write(df_sweep.groupby(level="n_failed").max())
+
+    st.markdown("## Exhaustive sweep: all failure states")
+    st.write(df_sweep)
+
+
+def prune_profile_traces(directory, keep):
+    # Mantém só os keep traces mais recentes do diretório; outras sessões podem apagar os mesmos arquivos
+    traces = []
+    for entry in os.scandir(directory):
+        if entry.name.startswith("trace_") and entry.name.endswith(".json"):
+            try:
+                traces.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                continue
+    for _, path in sorted(traces, reverse=True)[keep:]:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def display_profiling(profiler, write_trace=False):
+    # Painel de tempos no menu lateral; com write_trace, o trace também é gravado em PROFILE_DIR (padrão:
+    # subdiretório do diretório temporário), que guarda só os PROFILE_KEEP traces mais recentes (padrão: 20)
+    summary = profiler.summary()
+    st.sidebar.header("Profiling")
+    if not summary:
+        st.sidebar.caption("Nenhum intervalo registrado nesta execução.")
+        return
+
+    df_timing = pd.DataFrame(summary).set_index("name")
+    df_timing[["total_s", "mean_s"]] *= 1e3
+    st.sidebar.dataframe(df_timing.rename(columns={"calls": "chamadas", "total_s": "total (ms)",
+                                                   "mean_s": "média (ms)"}))
+    st.sidebar.write({name: int(value) for name, value in profiler.counters.items()})
+
+    file_name = f"trace_{time.strftime('%Y%m%d_%H%M%S', time.localtime(profiler.created))}.json"
+    if write_trace:
+        directory = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "capacitor_bank_traces"))
+        os.makedirs(directory, exist_ok=True)
+        # Sufixo aleatório: sessões que executam no mesmo segundo não sobrescrevem o trace uma da outra
+        unique_name = file_name.replace(".json", f"_{uuid.uuid4().hex[:8]}.json")
+        path = profiler.write_trace(os.path.join(directory, unique_name))
+        prune_profile_traces(directory, int(os.environ.get("PROFILE_KEEP", 20)))
+        st.sidebar.caption(f"Trace gravado em {path}")
+    st.sidebar.download_button("Baixar trace (Chrome)", json.dumps(profiler.chrome_trace()),
+                               file_name=file_name, mime="application/json")
+    st.sidebar.download_button("Baixar trace (speedscope)", json.dumps(profiler.speedscope()),
+                               file_name=file_name.replace(".json", ".speedscope.json"),
+                               mime="application/json")